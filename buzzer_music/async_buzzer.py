@@ -1,6 +1,9 @@
 # ----------------------------------------------------------------------------
 # The AsyncBuzzer class wraps low-level PWM to play tones.
 #
+# The output is created by a backend (see backend.py): by default a PWM-pin,
+# alternatively e.g. a voice of a synthesizer.
+#
 # Author: Bernhard Bablok
 # License: GPL3
 #
@@ -10,26 +13,56 @@
 
 """ Implementation of class AsyncBuzzer """
 
-import pwmio
 import asyncio
+from adafruit_ticks import ticks_ms, ticks_add, ticks_diff
+
+from .backend import PWMBackend
 
 from .pitch import PITCH   # dictionary of tones mapping tone to frequency
+from .pitch import FREQ    # frequencies indexed by pitch-index
 
 DC_ON  = 65535
 DC_OFF = 0
 VOLDIV = [200, 100, 67, 50, 40, 33, 29, 22, 11, 2]
 
+# duty-cycles indexed by volume-level 0-10
+DUTY = [DC_OFF] + [int(DC_ON/div) for div in VOLDIV]
+
+def level(volume):
+  """ volume-level 0-10 for volume (1-10, 0.1-1.0 or 11-100) """
+  if volume < 1:
+    volume = int(round(volume*10,0))
+  elif volume > 10 and volume < 101:
+    volume = int(round(volume/10,0))
+  return max(0,min(int(volume),10))
+
 class AsyncBuzzer:
   """ asynchronous operating buzzer """
 
-  def __init__(self,pin):
-    """ constructor """
+  def __init__(self,pin,backend=None):
+    """ constructor.
+
+    backend: output backend (see backend.py, default: PWMBackend)
+    """
     self._pin = pin
     self._pwm = None
+    self._backend = backend if backend else PWMBackend()
     self.init()
     self._lock = asyncio.Lock()
     self.busy  = False   # set early before calling tone() if necessary!
 
+    # slot for the next tone of the worker
+    self._ready     = asyncio.Event()
+    self._pitch     = 0
+    self._duration  = 0
+    self._volume    = 0
+    self._on_end    = None
+    self._end       = 0       # end of tone (ticks)
+    self._sounding  = False   # tone was already switched on by sound()
+    self._task      = None    # worker task
+    self._running   = False   # worker task is running (can be interrupted)
+    self._interrupt = False   # current tone is stolen
+
   def deinit(self):
     """ free ressources """
     if self._pwm:
@@ -39,10 +72,36 @@ class AsyncBuzzer:
   def init(self):
     """ re-initialize PWM """
     if not self._pwm:
-      self._pwm  = pwmio.PWMOut(self._pin,variable_frequency=True)
+      self._pwm  = self._backend.output(self._pin)
+
+  def _frequency(self,pitch):
+    """ frequency of pitch (name or pitch-index) """
+    if isinstance(pitch,int):
+      return FREQ[pitch]
+    else:
+      return PITCH[pitch]
+
+  def _duty_cycle(self,volume):
+    """ duty-cycle for volume (1-10, 0.1-1.0 or 11-100) """
+    if isinstance(volume,int) and 0 <= volume <= 10:
+      return DUTY[volume]
+    return DUTY[level(volume)]
+
+  def _on(self,pitch,volume):
+    """ switch tone on """
+    self._pwm.frequency  = self._frequency(pitch)
+    self._pwm.duty_cycle = self._duty_cycle(volume)
+
+  def _off(self):
+    """ switch tone off """
+    if self._pwm:
+      self._pwm.duty_cycle = DC_OFF
 
   async def tone(self,pitch,duration,volume=10,on_end=None):
-    """ play the tone for the given duration (volume: 1-10) """
+    """ play the tone for the given duration (volume: 1-10).
+
+    pitch: name of the tone (e.g. 'C4') or pitch-index (see pitch.NAMES)
+    """
 
     # Note: calling tone() will not start the method, but just return
     #       a coroutine-object. Set buzzer.busy=True externally to
@@ -54,16 +113,9 @@ class AsyncBuzzer:
     if not volume:
       await asyncio.sleep(duration)  # just sleep for for zero volume
       return
-    if volume < 1:
-      volume = int(round(volume*10,0))
-    elif volume > 10 and volume < 101:
-      volume = int(round(volume/10,0))
-    else:
-      volume = min(volume,10)
-    self._pwm.frequency = PITCH[pitch]
-    self._pwm.duty_cycle = int(DC_ON/VOLDIV[volume-1])
+    self._on(pitch,volume)
     await asyncio.sleep(duration)
-    self._pwm.duty_cycle = DC_OFF
+    self._off()
     self._lock.release()
     self.busy = False
 
@@ -71,6 +123,78 @@ class AsyncBuzzer:
     if on_end:
       on_end(self)
 
+  def play(self,pitch,duration,volume=10,on_end=None):
+    """ pass a tone to the worker (see worker()).
+
+    There is only a single slot for the next tone. If the buzzer is busy,
+    the current tone is interrupted (stolen) without calling on_end.
+    """
+
+    if self.busy and self._running and not self._interrupt:
+      self._interrupt = True
+      self._task.cancel()
+    self.busy      = True
+    self._pitch    = pitch
+    self._duration = duration
+    self._volume   = volume
+    self._on_end   = on_end
+    self._end      = ticks_add(ticks_ms(),int(duration*1000))
+    self._sounding = False
+    self._ready.set()
+
+  def sound(self):
+    """ switch on the tone passed by play() immediately.
+
+    Without sound(), the worker switches on the tone once it is scheduled.
+    Calling sound() for all notes of a chord in a row makes them start
+    together.
+    """
+    if self._volume:
+      self._on(self._pitch,self._volume)
+    else:
+      self._off()
+    self._sounding = True
+
+  def start(self):
+    """ create and return the worker task """
+    self._running = False        # a task cancelled before it runs is lost
+    self._task    = asyncio.create_task(self.worker())
+    return self._task
+
+  def stop(self):
+    """ cancel the worker task and reset the slot """
+    self._interrupt = False      # a pending steal must not swallow the cancel
+    if self._task:
+      self._task.cancel()
+      self._task = None
+    self._running = False
+    self._ready.clear()
+    self.busy = False
+
+  async def worker(self):
+    """ long-lived task playing the tones passed by play() """
+
+    self._running = True
+    try:
+      while True:
+        try:
+          await self._ready.wait()
+          self._ready.clear()
+          if not self._sounding:
+            self.sound()
+          await asyncio.sleep(max(0,ticks_diff(self._end,ticks_ms()))/1000)
+        except asyncio.CancelledError:
+          if not self._interrupt:
+            raise
+          self._interrupt = False    # stolen: play next tone
+          continue
+        self._off()
+        self.busy = False
+        if self._on_end:
+          self._on_end(self)
+    finally:
+      self._off()
+
   def busy(self):
     """ check busy state """
     return self._lock.locked()
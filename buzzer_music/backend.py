@@ -0,0 +1,140 @@
+# ----------------------------------------------------------------------------
+# Output backends for AsyncBuzzer.
+#
+# A backend creates the output of a buzzer: backend.output(pin) returns an
+# object with the interface of pwmio.PWMOut that AsyncBuzzer uses (the
+# properties frequency and duty_cycle and the method deinit()). A duty-cycle
+# of zero switches the output off.
+#
+# PWMBackend:       one PWM-pin per buzzer (the default)
+# RecordingBackend: records all changes, no hardware (for tests)
+# SynthBackend:     many voices mixed by synthio to a single audio output,
+#                   "pins" are just numbers of the voices
+#
+# Author: Bernhard Bablok
+# License: GPL3
+#
+# Website: https://github.com/bablokb/cp-buzzer-music
+#
+# ----------------------------------------------------------------------------
+
+""" output backends (PWM, recording, synthesizer) """
+
+from adafruit_ticks import ticks_ms
+
+FULL_DUTY = 32767       # duty-cycle of full volume (square wave)
+
+# --- PWM   ------------------------------------------------------------------
+
+class PWMBackend:
+  """ one PWM-output per buzzer """
+
+  def output(self,pin):
+    """ create output for pin """
+    import pwmio
+    return pwmio.PWMOut(pin,variable_frequency=True)
+
+# --- recording   ------------------------------------------------------------
+
+class _Recorder:
+  """ output recording changes to the log of the backend """
+
+  def __init__(self,log,channel):
+    self._log       = log
+    self._channel   = channel
+    self._frequency = 500
+    self._duty      = 0
+
+  def deinit(self):
+    pass
+
+  @property
+  def frequency(self):
+    return self._frequency
+
+  @frequency.setter
+  def frequency(self,value):
+    self._frequency = value
+    self._log.append((ticks_ms(),self._channel,value,self._duty))
+
+  @property
+  def duty_cycle(self):
+    return self._duty
+
+  @duty_cycle.setter
+  def duty_cycle(self,value):
+    self._duty = value
+    self._log.append((ticks_ms(),self._channel,self._frequency,value))
+
+class RecordingBackend:
+  """ record changes of all outputs to log: (ticks,pin,frequency,duty) """
+
+  def __init__(self):
+    self.log = []
+
+  def output(self,pin):
+    """ create output for pin """
+    return _Recorder(self.log,pin)
+
+# --- synthesizer   ----------------------------------------------------------
+
+class _SynthVoice:
+  """ output playing a note of a synthio.Synthesizer """
+
+  def __init__(self,synth,note):
+    self._synth = synth
+    self._note  = note
+    self._duty  = 0
+
+  def deinit(self):
+    self.duty_cycle = 0
+
+  @property
+  def frequency(self):
+    return self._note.frequency
+
+  @frequency.setter
+  def frequency(self,value):
+    self._note.frequency = value
+
+  @property
+  def duty_cycle(self):
+    return self._duty
+
+  @duty_cycle.setter
+  def duty_cycle(self,value):
+    if value:
+      self._note.amplitude = min(value,FULL_DUTY)/FULL_DUTY
+      if not self._duty:
+        self._synth.press(self._note)
+    elif self._duty:
+      self._synth.release(self._note)
+    self._duty = value
+
+class SynthBackend:
+  """ all buzzers are voices of a single synthesizer """
+
+  def __init__(self,audio=None,sample_rate=22050,waveform=None):
+    """ constructor.
+
+    audio: audio output (e.g. audiopwmio.PWMAudioOut) playing the
+           synthesizer (None: don't play, e.g. for tests)
+    sample_rate: sample rate of the synthesizer
+    waveform: waveform of the voices (array of 'h', default: square wave)
+    """
+
+    import synthio
+    from array import array
+    self._synthio = synthio
+    if waveform is None:
+      waveform = array('h',[FULL_DUTY]*8 + [-FULL_DUTY]*8)
+    self.waveform = waveform
+    self.synth = synthio.Synthesizer(sample_rate=sample_rate)
+    if audio:
+      audio.play(self.synth)
+
+  def output(self,pin):
+    """ create output (a voice) for pin (any value) """
+    note = self._synthio.Note(frequency=500,amplitude=0,
+                              waveform=self.waveform)
+    return _SynthVoice(self.synth,note)
@@ -0,0 +1,127 @@
+# ----------------------------------------------------------------------------
+# The SongCache class keeps parsed songs in memory.
+#
+# Notes of a song are stored in compact typed arrays (start, duration,
+# pitch-index, voice), about ten bytes per note. Replaying a cached song
+# (e.g. with MusicPlayer.play(...,loop=True)) does not read or parse
+# anything. The cache has a memory budget: songs that don't fit are not
+# cached, and the least recently used songs are evicted to make room.
+#
+# Author: Bernhard Bablok
+# License: GPL3
+#
+# Website: https://github.com/bablokb/cp-buzzer-music
+#
+# ----------------------------------------------------------------------------
+
+""" Implementation of class SongCache """
+
+import struct
+from array import array
+from buzzer_music.songfile import NO_VOICE
+
+class SongCache:
+  """ LRU-cache of parsed songs """
+
+  def __init__(self,budget=8192):
+    """ constructor.
+
+    budget: maximal memory used for notes (bytes)
+    """
+
+    self.budget = budget
+    self.size   = 0                   # memory used for notes
+    self.hits   = 0
+    self.misses = 0
+    self._songs = {}                  # key -> (start,duration,pitch,voice)
+    self._sizes = {}                  # key -> memory used
+    self._lru   = []                  # keys, least recently used first
+
+  def __len__(self):
+    return len(self._songs)
+
+  # --- size of an entry   ---------------------------------------------------
+
+  def _size(self,typecode,count):
+    """ memory for count notes """
+    return count*(2*struct.calcsize(typecode) + 2)
+
+  # --- lookup song   --------------------------------------------------------
+
+  def get(self,key):
+    """ return cached notes of the song or None """
+    entry = self._songs.get(key,None)
+    if entry is None:
+      self.misses += 1
+      return None
+    self.hits += 1
+    self._lru.remove(key)
+    self._lru.append(key)
+    return entry
+
+  # --- yield notes of a cached song   ---------------------------------------
+
+  def notes(self,entry):
+    """ yield notes (start,pitch-index,duration[,voice]) of an entry """
+    start, duration, pitch, voice = entry
+    for i in range(len(pitch)):
+      if voice[i] == NO_VOICE:
+        yield start[i], pitch[i], duration[i]
+      else:
+        yield start[i], pitch[i], duration[i], voice[i]
+
+  # --- pass through and record notes   --------------------------------------
+
+  def record(self,key,notes,typecode):
+    """ yield notes and cache them once all notes were consumed.
+
+    typecode: array-type of start and duration ('l': ticks, 'f': seconds)
+    """
+
+    start    = array(typecode)
+    duration = array(typecode)
+    pitch    = array('B')
+    voice    = array('B')
+    limit    = self.budget//self._size(typecode,1)
+    for note in notes:
+      if pitch is not None:
+        start.append(note[0])
+        pitch.append(note[1])
+        duration.append(note[2])
+        voice.append(note[3] if len(note) > 3 else NO_VOICE)
+        if len(pitch) > limit:        # too large: don't cache
+          start = duration = pitch = voice = None
+      yield note
+    if pitch is not None:
+      self._put(key,(start,duration,pitch,voice),
+                self._size(typecode,len(pitch)))
+
+  # --- add song   -----------------------------------------------------------
+
+  def _put(self,key,entry,size):
+    """ add entry, evict least recently used songs """
+    if key in self._songs:
+      self._remove(key)
+    while self._lru and self.size + size > self.budget:
+      self._remove(self._lru[0])
+    self._songs[key] = entry
+    self._sizes[key] = size
+    self._lru.append(key)
+    self.size += size
+
+  # --- remove song   --------------------------------------------------------
+
+  def _remove(self,key):
+    """ remove song from cache """
+    del self._songs[key]
+    self._lru.remove(key)
+    self.size -= self._sizes.pop(key)
+
+  # --- clear cache   --------------------------------------------------------
+
+  def clear(self):
+    """ remove all songs """
+    self._songs = {}
+    self._sizes = {}
+    self._lru   = []
+    self.size   = 0
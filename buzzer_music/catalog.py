@@ -0,0 +1,50 @@
+# ----------------------------------------------------------------------------
+# Catalog of a music library.
+#
+# The catalog (created by tools/compile_library.py) is a text file with a
+# line per song: "file duration notes buzzers low high hash". Duration is
+# in seconds, buzzers is the peak polyphony of the song and low/high are
+# the lowest and highest pitch. The hash identifies the source of the song
+# and is only used by the compiler.
+#
+# With the catalog, a program can list and pick songs without opening the
+# song files.
+#
+# Author: Bernhard Bablok
+# License: GPL3
+#
+# Website: https://github.com/bablokb/cp-buzzer-music
+#
+# ----------------------------------------------------------------------------
+
+""" read and write the catalog of a music library """
+
+CATALOG = "catalog.txt"
+HEADER  = "# file duration notes buzzers low high hash"
+
+# --- read catalog   ---------------------------------------------------------
+
+def read(filename=CATALOG):
+  """ yield entries (file,duration,notes,buzzers,low,high,hash) """
+
+  with open(filename,"rt") as file:
+    for nr,line in enumerate(file,1):
+      line = line.strip()
+      if not line or line[0] == "#":
+        continue
+      fields = line.split()
+      if len(fields) != 7:
+        raise ValueError(f"catalog line {nr}: malformed entry '{line}'")
+      name, duration, notes, buzzers, low, high, hash_ = fields
+      yield name, float(duration), int(notes), int(buzzers), low, high, hash_
+
+# --- write catalog   --------------------------------------------------------
+
+def write(filename,entries):
+  """ write entries (file,duration,notes,buzzers,low,high,hash) """
+
+  with open(filename,"wt") as file:
+    file.write(HEADER+"\n")
+    for name,duration,notes,buzzers,low,high,hash_ in entries:
+      file.write(
+        f"{name} {duration:.3f} {notes} {buzzers} {low} {high} {hash_}\n")
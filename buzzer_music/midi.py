@@ -0,0 +1,195 @@
+# ----------------------------------------------------------------------------
+# Streaming reader for Standard MIDI Files (*.mid).
+#
+# The tracks are not loaded into memory: every track reads its event chunk
+# through a small buffer and the tracks are merged in time order with a
+# heap (one entry per track). Note-on/note-off events are paired to notes
+# (start,pitch-index,duration) as they occur, tempo changes are applied
+# incrementally. Memory is bounded by the number of tracks and of notes
+# that are still open (plus notes that started after the oldest open note).
+#
+# Notes on the percussion channel (channel 10) are skipped.
+#
+# Author: Bernhard Bablok
+# License: GPL3
+#
+# Website: https://github.com/bablokb/cp-buzzer-music
+#
+# ----------------------------------------------------------------------------
+
+""" streaming reader for Standard MIDI Files """
+
+import struct
+from buzzer_music.reorder   import ReorderBuffer
+from buzzer_music.tokenizer import NR_PITCHES
+
+TRACK_BUF  = 64          # read buffer per track
+PERCUSSION = 9           # channel 10
+TEMPO      = 500000      # default tempo (us per quarter note, 120 bpm)
+MIDI_C0    = 12          # MIDI note number of C0 (pitch-index 0)
+
+# data bytes of channel messages (index: status >> 4)
+_DATA = [0,0,0,0,0,0,0,0,2,2,2,2,1,1,2,0]
+
+class _Track:
+  """ event chunk of a track, read through a small buffer """
+
+  def __init__(self,file,start,length):
+    self._file  = file
+    self._buf   = bytearray(TRACK_BUF)
+    self._bpos  = 0                    # file position of buffer
+    self._blen  = 0
+    self.pos    = start
+    self.end    = start + length
+    self.status = 0                    # running status
+    self.tick   = 0                    # absolute time of next event
+
+  def byte(self):
+    """ return next byte """
+    pos = self.pos
+    if not self._bpos <= pos < self._bpos + self._blen:
+      if pos >= self.end:
+        raise ValueError("MIDI: truncated track")
+      self._file.seek(pos)
+      self._bpos = pos
+      self._blen = self._file.readinto(self._buf)
+      if not self._blen:
+        raise ValueError("MIDI: truncated file")
+    self.pos += 1
+    return self._buf[pos-self._bpos]
+
+  def number(self):
+    """ return next variable-length number """
+    value = 0
+    while True:
+      b = self.byte()
+      value = (value << 7) | (b & 0x7F)
+      if b < 0x80:
+        return value
+
+# --- read notes   -----------------------------------------------------------
+
+def read(filename,ticks=False):
+  """ yield notes (start,pitch-index,duration) of a MIDI file.
+
+  ticks: if True, return start and duration as integer milliseconds,
+         else as seconds (float)
+  """
+
+  with open(filename,"rb") as file:
+    tag, length = struct.unpack(">4sI",file.read(8))
+    if tag != b"MThd":
+      raise ValueError("not a MIDI file")
+    _, ntracks, division = struct.unpack(">HHH",file.read(6))
+
+    # locate track chunks (skip other chunks)
+    tracks = []
+    pos = 8 + length
+    while len(tracks) < ntracks:
+      file.seek(pos)
+      header = file.read(8)
+      if len(header) < 8:
+        break
+      tag, length = struct.unpack(">4sI",header)
+      if tag == b"MTrk":
+        tracks.append(_Track(file,pos+8,length))
+      pos += 8 + length
+
+    yield from _merge(tracks,division,1000 if ticks else 1,ticks)
+
+# --- merge tracks   ---------------------------------------------------------
+
+def _merge(tracks,division,scale,ticks):
+  """ merge events of all tracks, yield notes sorted by start """
+
+  if division & 0x8000:                # SMPTE: frames/s and ticks/frame
+    tick_time = scale/((256 - (division >> 8))*(division & 0xFF))
+    ppq = 0
+  else:
+    ppq = division
+    tick_time = scale*TEMPO/ppq/1000000
+
+  events = ReorderBuffer(0)            # next event of every track
+  for index,track in enumerate(tracks):
+    if track.pos < track.end:
+      track.tick = track.number()
+      events.push((track.tick,index))
+
+  tempo_tick = 0                       # tick and time of last tempo change
+  tempo_time = 0
+  now        = 0
+  sounding   = {}                      # channel/pitch -> start
+  done       = ReorderBuffer(0)        # finished notes, sorted by start
+
+  while len(events):
+    tick, index = events.pop()
+    track = tracks[index]
+    now   = tempo_time + (tick-tempo_tick)*tick_time
+
+    status = track.byte()
+    if status < 0x80:                  # running status
+      data1  = status
+      status = track.status
+      if not status:
+        raise ValueError("MIDI: data without status")
+    elif status < 0xF0:
+      track.status = status
+      data1 = track.byte()
+    else:                              # meta and sysex cancel running status
+      track.status = 0
+
+    if status < 0xF0:
+      data2 = track.byte() if _DATA[status >> 4] == 2 else 0
+      kind  = status & 0xF0
+      channel = status & 0x0F
+      if (kind == 0x80 or kind == 0x90) and channel != PERCUSSION:
+        key = (channel << 7) | data1
+        if key in sounding:            # note-off, or retrigger
+          start = sounding.pop(key)
+          pitch = data1 - MIDI_C0
+          if 0 <= pitch < NR_PITCHES and now > start:
+            done.push((start,pitch,now-start))
+        if kind == 0x90 and data2:
+          sounding[key] = now
+        yield from _flush(done,sounding,ticks)
+    elif status == 0xFF:               # meta event
+      kind   = track.byte()
+      length = track.number()
+      if kind == 0x51 and length == 3 and ppq:
+        tempo = (track.byte() << 16) | (track.byte() << 8) | track.byte()
+        length = 0
+        tempo_tick, tempo_time = tick, now
+        tick_time = scale*tempo/ppq/1000000
+      elif kind == 0x2F:               # end of track
+        track.pos = track.end
+      track.pos += length
+    else:                              # sysex (0xF0, 0xF7)
+      length = track.number()
+      track.pos += length
+
+    if track.pos < track.end:
+      track.tick += track.number()
+      events.push((track.tick,index))
+
+  # notes without note-off end with the last event
+  for key,start in sounding.items():
+    pitch = (key & 0x7F) - MIDI_C0
+    if 0 <= pitch < NR_PITCHES and now > start:
+      done.push((start,pitch,now-start))
+  sounding.clear()
+  yield from _flush(done,sounding,ticks)
+
+# --- return finished notes   ------------------------------------------------
+
+def _flush(done,sounding,ticks):
+  """ yield finished notes that started before all sounding notes """
+
+  if not len(done):
+    return
+  first = min(sounding.values()) if sounding else None
+  while len(done) and (first is None or done.peek()[0] <= first):
+    start, pitch, duration = done.pop()
+    if ticks:
+      yield int(start+0.5), pitch, int(duration+0.5)
+    else:
+      yield start, pitch, duration
@@ -0,0 +1,157 @@
+# ----------------------------------------------------------------------------
+# The MultiplexBuzzer class plays multiple notes on a single buzzer
+# (simulated polyphony).
+#
+# The buzzer cycles its frequency across all active notes at a given rate
+# (fast arpeggio). The frequencies and duty-cycles of the active notes are
+# kept in a precomputed schedule that is only updated when a note starts or
+# ends, so the switching loop does not allocate memory.
+#
+# Author: Bernhard Bablok
+# License: GPL3
+#
+# Website: https://github.com/bablokb/cp-buzzer-music
+#
+# ----------------------------------------------------------------------------
+
+""" Implementation of class MultiplexBuzzer """
+
+import asyncio
+from adafruit_ticks import ticks_ms, ticks_add, ticks_diff, ticks_less
+
+from .async_buzzer import AsyncBuzzer
+
+class MultiplexBuzzer(AsyncBuzzer):
+  """ buzzer with multiple voices using time-multiplexing """
+
+  def __init__(self,pin,voices=2,rate=30,backend=None):
+    """ constructor.
+
+    voices: maximum number of simultaneous notes
+    rate: switching rate (notes per second)
+    backend: output backend (see backend.py, default: PWMBackend)
+    """
+
+    super().__init__(pin,backend)
+    self.voices   = voices
+    self.active   = 0                  # number of active notes
+    self._period  = int(1000/rate)     # ms
+    self._freq    = [0]*voices         # frequency per slot (0: slot free)
+    self._duty    = [0]*voices
+    self._end     = [0]*voices         # end of note (ticks)
+    self._on_ends = [None]*voices
+    self._sfreq   = [0]*voices         # schedule: frequencies
+    self._sduty   = [0]*voices         # schedule: duty-cycles
+    self._next    = 0                  # next end of an active note (ticks)
+    self._jump    = -1                 # schedule-position of a new note
+    self._slot    = 0                  # slot of the last note (see sound())
+
+  def _schedule(self):
+    """ update schedule from active slots """
+    n = 0
+    for slot in range(self.voices):
+      if self._freq[slot]:
+        self._sfreq[n] = self._freq[slot]
+        self._sduty[n] = self._duty[slot]
+        if not n or ticks_less(self._end[slot],self._next):
+          self._next = self._end[slot]
+        n += 1
+    self.active = n
+    self.busy   = n > 0
+
+  def play(self,pitch,duration,volume=10,on_end=None):
+    """ add a note to a free slot (or steal the slot ending first) """
+
+    slot = -1
+    for i in range(self.voices):
+      if not self._freq[i]:
+        slot = i
+        break
+      if slot < 0 or ticks_less(self._end[i],self._end[slot]):
+        slot = i
+    self._freq[slot]    = self._frequency(pitch)
+    self._duty[slot]    = self._duty_cycle(volume) if volume else 0
+    self._end[slot]     = ticks_add(ticks_ms(),int(duration*1000))
+    self._on_ends[slot] = on_end
+    self._slot     = slot
+    self._sounding = False
+    idle = not self.active
+    self._schedule()
+    self._jump = 0
+    for i in range(slot):
+      if self._freq[i]:
+        self._jump += 1
+
+    # wake up worker
+    if idle:
+      self._ready.set()
+    elif self._running and not self._interrupt:
+      self._interrupt = True
+      self._task.cancel()
+
+  def sound(self):
+    """ switch to the note passed by play() immediately """
+    self._pwm.frequency  = self._freq[self._slot]
+    self._pwm.duty_cycle = self._duty[self._slot]
+    self._sounding = True
+
+  def stop(self):
+    """ cancel the worker task and clear all slots """
+    super().stop()
+    for slot in range(self.voices):
+      self._freq[slot]    = 0
+      self._on_ends[slot] = None
+    self.active = 0
+
+  def _expire(self,now):
+    """ remove notes that ended, execute callbacks """
+    ended = 0
+    for slot in range(self.voices):
+      if self._freq[slot] and ticks_diff(self._end[slot],now) <= 0:
+        self._freq[slot] = 0
+        ended += 1
+    if not ended:
+      return
+    self._schedule()
+    for slot in range(self.voices):
+      if not self._freq[slot] and self._on_ends[slot]:
+        on_end = self._on_ends[slot]
+        self._on_ends[slot] = None
+        on_end(self)
+
+  async def worker(self):
+    """ long-lived task cycling through the active notes """
+
+    self._running = True
+    pos = 0
+    try:
+      while True:
+        try:
+          if not self.active:
+            self._off()
+            await self._ready.wait()
+            self._ready.clear()
+          now = ticks_ms()
+          self._expire(now)
+          if not self.active:
+            continue
+          if 0 <= self._jump < self.active:
+            pos = self._jump                 # start new note immediately
+          else:
+            pos = pos + 1 if pos + 1 < self.active else 0
+          if self._sounding and self._jump >= 0:
+            self._sounding = False         # already switched on by sound()
+          else:
+            self._pwm.frequency  = self._sfreq[pos]
+            self._pwm.duty_cycle = self._sduty[pos]
+          self._jump = -1
+          delay = ticks_diff(self._next,now)
+          if self.active > 1 and self._period < delay:
+            delay = self._period
+          await asyncio.sleep(delay/1000)
+        except asyncio.CancelledError:
+          if not self._interrupt:
+            raise
+          self._interrupt = False      # new note: update immediately
+    finally:
+      self._off()
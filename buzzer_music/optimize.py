@@ -0,0 +1,144 @@
+# ----------------------------------------------------------------------------
+# The NoteOptimizer class removes redundancy from a stream of notes.
+#
+# Songs exported from onlinesequencer.net contain duplicate notes (same time
+# and pitch), overlapping copies of a note, notes with near-zero duration and
+# rounding jitter (e.g. 2.8166663646698). Every note costs a buzzer and a few
+# PWM writes. The optimizer
+#
+#   - quantizes start and end of every note to a grid
+#   - drops notes that are shorter than min_duration (after quantizing)
+#   - merges notes of the same pitch that overlap or are duplicates
+#   - joins legato repeats (same pitch, next note starts when the last one
+#     ends, or at most 'legato' later) to a single note, so the buzzer is
+#     not switched off and on again
+#
+# The optimizer works on sorted streams (as returned by MusicReader) and
+# only buffers notes that might still be extended, at most 'hold' after
+# their start (the reader should not parse far ahead because of a long
+# note).
+#
+# Author: Bernhard Bablok
+# License: GPL3
+#
+# Website: https://github.com/bablokb/cp-buzzer-music
+#
+# ----------------------------------------------------------------------------
+
+""" Implementation of class NoteOptimizer """
+
+PWM_WRITES = 3     # per note: frequency, duty-cycle on, duty-cycle off
+
+class NoteOptimizer:
+  """ streaming optimizer for notes """
+
+  def __init__(self,grid=10,min_duration=10,legato=0,hold=1000):
+    """ constructor.
+
+    Units are those of the notes (milliseconds for MusicPlayer).
+
+    grid: grid for start and end of notes (0: don't quantize)
+    min_duration: minimal duration of a note (shorter notes are dropped)
+    legato: maximal gap between two notes of the same pitch to join them
+    hold: maximal time a note is held back for merging
+    """
+
+    self.grid         = grid
+    self.min_duration = min_duration
+    self.legato       = legato
+    self.hold         = hold
+    self.reset()
+
+  # --- reset statistics   ---------------------------------------------------
+
+  def reset(self):
+    """ reset statistics """
+    self.stats = {'notes': 0, 'out': 0, 'quantized': 0, 'short': 0,
+                  'duplicates': 0, 'overlaps': 0, 'legato': 0}
+
+  def saved(self):
+    """ return (notes,PWM-writes) saved """
+    notes = self.stats['notes'] - self.stats['out']
+    return notes, notes*PWM_WRITES
+
+  # --- quantize a time   ----------------------------------------------------
+
+  def _quantize(self,t):
+    """ round t to the grid """
+    grid = self.grid
+    if isinstance(t,int):
+      return (t + grid//2)//grid*grid
+    return round(t/grid)*grid
+
+  # --- optimize stream of notes   -------------------------------------------
+
+  def run(self,notes):
+    """ yield optimized notes (start,pitch-index,duration[,voice]).
+
+    A note is emitted at the latest 'hold' after its start, even if it is
+    still sounding. A later note of the same pitch that is completely
+    covered by the emitted note is dropped, a later note that only
+    overlaps it is emitted as a second note (and retriggers the buzzer).
+    """
+
+    stats    = self.stats
+    pending  = []                      # [start,pitch,end,voice] by start
+    head     = 0                       # first entry of pending not emitted
+    sounding = {}                      # pitch -> entry of pending
+    emitted  = {}                      # pitch -> end of last emitted note
+    for note in notes:
+      stats['notes'] += 1
+      start, pitch, duration = note[0], note[1], note[2]
+      end = start + duration
+      if self.grid:
+        qstart = self._quantize(start)
+        if qstart != start:
+          stats['quantized'] += 1
+        start, end = qstart, self._quantize(end)
+
+      # emit notes that can't be extended anymore
+      while head < len(pending) and (pending[head][2] + self.legato < start or
+                                     pending[head][0] + self.hold < start):
+        yield self._emit(pending[head],sounding,emitted)
+        pending[head] = None
+        head += 1
+      if head > 16 and 2*head > len(pending):
+        del pending[:head]             # drop emitted entries (amortized)
+        head = 0
+
+      if end - start < self.min_duration or end <= start:
+        stats['short'] += 1
+        continue
+
+      entry = sounding.get(pitch,None)
+      if entry is not None and start <= entry[2] + self.legato:
+        if start == entry[0]:
+          stats['duplicates'] += 1
+        elif start < entry[2]:
+          stats['overlaps'] += 1
+        else:
+          stats['legato'] += 1
+        if entry[2] < end:
+          entry[2] = end
+        continue
+      if end <= emitted.get(pitch,start):  # covered by an emitted note
+        stats['overlaps'] += 1
+        continue
+
+      entry = [start,pitch,end,note[3] if len(note) > 3 else None]
+      sounding[pitch] = entry
+      pending.append(entry)
+
+    for i in range(head,len(pending)):
+      yield self._emit(pending[i],sounding,emitted)
+
+  def _emit(self,entry,sounding,emitted):
+    """ return note for entry of pending notes """
+    self.stats['out'] += 1
+    start, pitch, end, voice = entry
+    if sounding.get(pitch,None) is entry:
+      del sounding[pitch]
+    emitted[pitch] = end
+    if voice is None:
+      return start, pitch, end-start
+    return start, pitch, end-start, voice
@@ -1,6 +1,11 @@
 # ----------------------------------------------------------------------------
 # Tone frequencies. Taken from https://github.com/james1236/buzzer_music
 #
+# The tables are equal temperament with A4 = 440Hz (rounded). Use tune() to
+# rebuild them for a different reference, a transposition or the usable
+# range of a buzzer. Songs are parsed to pitch-indices, so at play time the
+# frequency is a single list lookup.
+#
 # Author: Bernhard Bablok
 # License: GPL3
 #
@@ -8,7 +13,9 @@
 #
 # ----------------------------------------------------------------------------
 
-""" dictionary of tones mapping tone to frequency """
+""" dictionary of tones mapping tone to frequency (plus index-tables) """
+
+A4 = 57               # pitch-index of A4 (the tuning reference)
 
 PITCH = {
   'C0':16, 'C#0':17, 'D0':18, 'D#0':19, 'E0':21, 'F0':22, 'F#0':23, 'G0':24,
@@ -29,3 +36,36 @@ PITCH = {
   'C#9':8870, 'D9':9397, 'D#9':9956, 'E9':10548, 'F9':11175, 'F#9':11840,
   'G9':12544, 'G#9':13290, 'A9':14080, 'A#9':14917, 'B9':15804
 }
+
+# ordered list of pitch names: the position within the list is the
+# pitch-index used by compiled songs (C0 is 0, B9 is 119)
+NAMES = [name+str(octave) for octave in range(10)
+         for name in ('C','C#','D','D#','E','F','F#','G','G#','A','A#','B')]
+
+# frequencies indexed by pitch-index
+FREQ = [PITCH[name] for name in NAMES]
+
+# --- rebuild tables   -------------------------------------------------------
+
+def tune(a4=440,transpose=0,fmin=0,fmax=0):
+  """ rebuild FREQ and PITCH in place (call before playing).
+
+  a4: frequency of A4 (Hz)
+  transpose: semitones to shift every pitch
+  fmin, fmax: usable range of the buzzer (0: no limit). Pitches outside
+              the range are shifted by octaves into the range (or clamped,
+              if the range is smaller than an octave)
+  """
+
+  octaves = fmin and fmax and fmax >= 2*fmin
+  for index,name in enumerate(NAMES):
+    freq = a4*2**((index+transpose-A4)/12)
+    if octaves or not (fmin and fmax):
+      while fmin and freq < fmin:
+        freq *= 2
+      while fmax and freq > fmax:
+        freq /= 2
+    else:
+      freq = min(max(freq,fmin),fmax)
+    FREQ[index] = int(freq+0.5)
+    PITCH[name] = FREQ[index]
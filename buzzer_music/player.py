@@ -7,7 +7,7 @@
 #   - songs can be passed as string or as filename
 #   - processing using asyncio
 #   - low memory requirements (uses streaming)
-#   - (currently) no simulated polyphony (i.e. no fast arpeggios)
+#   - optional simulated polyphony (fast arpeggios, see multiplex.py)
 #
 # Author: Bernhard Bablok
 # License: GPL3
@@ -18,163 +18,553 @@
 
 """ Implementation of class MusicPlayer """
 
-import time
 import gc
 import collections
 import asyncio
-from buzzer_music.async_buzzer import AsyncBuzzer
+from adafruit_ticks import ticks_ms, ticks_add, ticks_diff, ticks_less
+try:
+  from time import monotonic_ns
+  def _ticks_us():
+    return monotonic_ns()//1000
+except ImportError:                       # no long integers
+  def _ticks_us():
+    return ticks_ms()*1000
+from buzzer_music.async_buzzer import AsyncBuzzer, level
+from buzzer_music.multiplex    import MultiplexBuzzer
 from buzzer_music.reader       import MusicReader
-
-GC_INTERVAL = 60
+from buzzer_music.cache        import SongCache
+from buzzer_music.ring         import Ring
+from buzzer_music.trace        import Trace
+
+GC_INTERVAL = 60       # s, collect in the next gap after this interval
+                       # (0: only if free memory is low)
+GC_GAP      = 20       # ms, minimal gap to the next note for a collection
+GC_LOW_FREE = 16384    # collect in the next gap if less memory is free
+GC_MIN_FREE = 4096     # collect immediately if less memory is free
+GC_CHECK    = 1        # s, interval of checks for GC_MIN_FREE
+IO_GUARD    = 10       # ms, minimal slack to the next note for reading
+IO_SLICE    = 20       # ms, maximal time of the reader without yielding
+
+# --- memory   ---------------------------------------------------------------
+
+def _memory(alloc=False):
+  """ return free (or allocated) memory, -1 if unknown (e.g. CPython) """
+  if not hasattr(gc,"mem_alloc"):
+    return -1
+  return gc.mem_alloc() if alloc else gc.mem_free()
+
+# --- steal policies   -------------------------------------------------------
+#
+# A policy is called when all buzzers are busy. It returns the index of the
+# buzzer to steal, or -1 if no buzzer should be stolen. The player provides
+# the start, end and pitch of the notes currently playing (vstart, vend,
+# vpitch, indexed by buzzer). Start and end are ticks (see adafruit_ticks).
+
+def _min_index(values):
+  """ return index of minimal value """
+  index = 0
+  for i in range(1,len(values)):
+    if values[i] < values[index]:
+      index = i
+  return index
+
+def _min_ticks(values):
+  """ return index of earliest ticks-value """
+  index = 0
+  for i in range(1,len(values)):
+    if ticks_less(values[i],values[index]):
+      index = i
+  return index
+
+def steal_oldest(player,note):
+  """ steal the buzzer playing the oldest note """
+  return _min_ticks(player.vstart)
+
+def steal_shortest(player,note):
+  """ steal the buzzer with the shortest remaining time """
+  return _min_ticks(player.vend)
+
+def steal_lowest(player,note):
+  """ steal the buzzer playing the lowest pitch """
+  return _min_index(player.vpitch)
+
+def steal_retrigger(player,note):
+  """ steal a buzzer playing the same pitch (retrigger) """
+  for index,pitch in enumerate(player.vpitch):
+    if pitch == note[1]:
+      return index
+  return -1
+
+POLICIES = {
+  'oldest':    steal_oldest,
+  'shortest':  steal_shortest,
+  'lowest':    steal_lowest,
+  'retrigger': steal_retrigger
+  }
 
 class MusicPlayer:
   """ play notes on (multiple) buzzers """
 
-  def __init__(self, pins=[], volume=10, qlength=10, skip=False, debug=False):
+  def __init__(self, pins=[], volume=10, qlength=10, skip=False, window=64,
+               policy=None, voices=1, rate=30, trace=0, cache=0,
+               horizon=2, qmax=256, optimizer=None, backend=None,
+               debug=False):
     """ constructor.
 
-    pins: list of board.GPxxx
+    pins: list of board.GPxxx (or voice-numbers, see backend)
     volume: 1-10
-    qlength: read ahead limit for queue
+    qlength: minimal read ahead (notes per buzzer)
              (the default of 10 entries per buzzer should be fine)
+    horizon: read ahead (seconds of music) beyond qlength
+    qmax: maximal read ahead (notes, size of the preallocated queue).
+          The reader also stops at qlength if free memory is low
     skip: if True, don't play notes if no buzzer is free (else wait)
+    window: reorder-window for unsorted songs (see MusicReader)
+    policy: steal policy if all buzzers are busy: None, a name from
+            POLICIES or a function f(player,note) -> index|-1. If no
+            buzzer is stolen, the player skips or waits (see skip)
+    voices: number of simultaneous notes per buzzer. Values > 1 enable
+            simulated polyphony (time-multiplexing)
+    rate: switching rate for simulated polyphony (notes per second)
+    trace: size of the timing-trace (number of notes, 0: no trace)
+    cache: memory budget (bytes) for parsed songs, about 10 bytes per note.
+           Replayed and looped songs are not parsed again (0: no cache)
+    optimizer: NoteOptimizer for the notes of all songs (None: play notes
+               as read)
+    backend: output backend of the buzzers (see backend.py, default:
+             PWMBackend)
     debug: print a lot of debug-messages
     """
 
-    self._buzzers = [AsyncBuzzer(pin) for pin in pins]
-    self._volume  = volume
+    if voices > 1:
+      self._buzzers = [MultiplexBuzzer(pin,voices,rate,backend)
+                       for pin in pins]
+    else:
+      self._buzzers = [AsyncBuzzer(pin,backend) for pin in pins]
+    self._voices  = voices
+    self._nvoices = voices*len(pins)     # valid pre-assigned voices
+    self._volume  = level(volume)       # normalize once, not per note
     self._skip    = skip
-    self._reader  = MusicReader()
-    self._qlimit  = qlength*len(pins)
-    self._queue   = []
+    self.cache    = SongCache(cache) if cache else None
+    self._reader  = MusicReader(window=window,ticks=True,cache=self.cache)
+    self.optimizer = optimizer
+    self._qmin    = qlength*len(pins)
+    self._horizon = int(horizon*1000)
+    self._queue   = Ring(max(qmax,self._qmin+1))
+    self._last    = 0                   # start of last queued note
+    self._doffset = 0                   # sum of song-ends dispatched
+    self._mem_low = False               # free memory is low (see _gc)
+    self._sstart  = 0                   # start of I/O-slice (ticks)
+    self._snotes  = 0                   # notes read in I/O-slice
+    self._sslack  = -1                  # slack at start of I/O-slice
     self._tasks   = []
     self._debug   = debug
     self._stop    = False
     self._pause   = False
-    self._pstart = 0
+    self._pstart  = None
+    self._seek    = None                # new position (see seek())
+    self._songs   = []                  # (filename,song,bpm,ref)
+    self._loop    = False
+    self.song     = 0                   # index of current song
+    self.wakeups  = 0                   # iterations of the player tasks
+    self._note_nr  = 0                  # notes dispatched
+    self._gc_last  = 0                  # ticks of last collection
+    self._gc_alloc = 0                  # allocated memory after last collection
+    self._gc_notes = 0                  # notes dispatched at last collection
+
+    # buzzer allocation: free-list and state of busy buzzers
+    self._index  = {buzzer: i for i,buzzer in enumerate(self._buzzers)}
+    self._batch  = []                   # buzzers of notes due together
+    self._bcount = 0                    # trace.count at start of batch
+    self._free   = []
+    self._nfree  = [0]*len(pins)        # free slots of buzzer in free-list
+    self._taken  = [0]*len(pins)        # entries taken by pre-assigned voices
+    self.vstart  = [0]*len(pins)
+    self.vend    = [0]*len(pins)
+    self.vpitch  = [0]*len(pins)
+    if isinstance(policy,str):
+      self._policy = POLICIES[policy]
+      self._pname  = policy
+    else:
+      self._policy = policy
+      self._pname  = policy.__name__ if policy else None
+    self.stats   = {}                   # policy -> {'steals': n, 'drops': n}
+    self.trace   = Trace(trace) if trace else None
+
+    # events replacing busy-waiting
+    self._notes_avail = asyncio.Event()   # queue is not empty
+    self._space_avail = asyncio.Event()   # queue is not full
+    self._buzzer_free = asyncio.Event()   # a buzzer finished a tone
+    self._resumed     = asyncio.Event()   # not paused
+    self._started     = asyncio.Event()   # initial read-ahead is done
+    self._resumed.set()
 
     if debug:
       self._msg = self._print
     else:
       self._msg = lambda msg: None
 
-    self._start   = time.monotonic()  # will be updated by play
+    self._start   = ticks_ms()        # will be updated by play
 
   # --- print debug-messages   -----------------------------------------------
 
   def _print(self,msg):
     """ print debug-messages """
-    print(f"[{time.monotonic()-self._start:5.3f}] {msg}")
+    print(f"[{ticks_diff(ticks_ms(),self._start)/1000:5.3f}] {msg}")
+
+  # --- count steals and drops   ---------------------------------------------
+
+  def _count(self,key):
+    """ update statistics of current policy """
+    if not self._pname in self.stats:
+      self.stats[self._pname] = {'steals': 0, 'drops': 0}
+    self.stats[self._pname][key] += 1
 
   # --- return first available buzzer   --------------------------------------
 
-  async def _free_buzzer(self):
-    """ return first free buzzer """
+  async def _free_buzzer(self,note):
+    """ return a free buzzer from the free-list, or steal a buzzer """
     while True:
-      for index,buzzer in enumerate(self._buzzers):
-        if not buzzer.busy:
-          buzzer.busy = True
-          return index,buzzer
+      self.wakeups += 1
+      if self._has_free():
+        index = self._free.pop()
+        self._nfree[index] -= 1
+        return index,self._buzzers[index]
+      if self._policy:
+        index = self._policy(self,note)
+        if index >= 0:
+          self._count('steals')
+          return index,self._buzzers[index]
       if self._skip:
+        self._count('drops')
         return 99,None
-      await asyncio.sleep(0)
+      self._buzzer_free.clear()
+      await self._buzzer_free.wait()
+
+  # --- return buzzer of a pre-assigned voice   -----------------------------
+
+  def _voice_buzzer(self,voice):
+    """ return the buzzer of a pre-assigned voice (no allocation search) """
+    index = voice % len(self._buzzers)
+    if self._nfree[index]:            # take slot, dropped from free-list later
+      self._nfree[index] -= 1
+      self._taken[index] += 1
+    return index,self._buzzers[index]
+
+  def _has_free(self):
+    """ drop taken entries from the end of the free-list, check for free """
+    free  = self._free
+    taken = self._taken
+    while free and taken[free[-1]]:
+      taken[free.pop()] -= 1          # entries of a buzzer are equivalent
+    return len(free) > 0
+
+  # --- switch on notes of a batch   -----------------------------------------
+
+  def _sound(self):
+    """ switch on all notes of the batch without yielding, record skew """
+    if self.trace:
+      first = _ticks_us()
+      for b in self._batch:
+        b.sound()
+      self.trace.skew_from(self._bcount,_ticks_us()-first)
+    else:
+      for b in self._batch:
+        b.sound()
+    self._batch.clear()
+
+  # --- callback of buzzers   ------------------------------------------------
+
+  def _on_end(self,buzzer):
+    """ return buzzer to free-list, wake up waiting dispatcher """
+    index = self._index[buzzer]
+    if buzzer.busy:                # still playing other notes
+      self._free.insert(0,index)
+    else:
+      self._free.append(index)
+    self._nfree[index] += 1
+    self._buzzer_free.set()
+
+  # --- garbage collection   -------------------------------------------------
+
+  def _gc_due(self):
+    """ check if a collection should run in the next gap """
+    if (GC_INTERVAL and
+        ticks_diff(ticks_ms(),self._gc_last) >= GC_INTERVAL*1000):
+      return True
+    free = _memory()
+    return 0 <= free < GC_LOW_FREE
+
+  def _collect(self,forced=False):
+    """ run gc.collect(), record duration and allocation per note """
+    start = ticks_ms()
+    if self.trace:
+      alloc = max(0,_memory(alloc=True) - self._gc_alloc)
+    gc.collect()
+    self._gc_last  = ticks_ms()
+    duration = ticks_diff(self._gc_last,start)
+    if self.trace:
+      self._gc_alloc = max(0,_memory(alloc=True))
+      self.trace.record_gc(ticks_diff(start,self._start),duration,
+                           self._note_nr,alloc,self._note_nr-self._gc_notes,
+                           forced)
+    self._gc_notes = self._note_nr
+    if self._debug:
+      self._msg(f"g: collection took {duration}ms"
+                f"{' (forced)' if forced else ''},"
+                f" free memory: {_memory()}")
 
   # --- gc task   ------------------------------------------------------------
 
   async def _gc(self):
-    """ run gc periodically """
+    """ fallback for the collections of the dispatcher (see _dispatch) """
     try:
       self._msg(f"g: starting GC-task")
       while True:
-        await asyncio.sleep(GC_INTERVAL)
-        self._msg(f"g: free memory: {gc.mem_free()}")
-        gc.collect()
-        self._msg(f"g: free memory: {gc.mem_free()}")
+        await asyncio.sleep(GC_CHECK)
+        self.wakeups += 1
+        free = _memory()
+        self._mem_low = 0 <= free < GC_LOW_FREE
+        if 0 <= free < GC_MIN_FREE:
+          self._collect(forced=True)
+        elif self._pause and self._gc_due():
+          self._collect()
     except:
       pass
     self._msg(f"g: GC-task finished")
 
   # --- reader task   --------------------------------------------------------
 
-  async def _read(self,filename,song,bpm,ref):
-    """ reader task providing notes to the queue """
+  def _queue_full(self):
+    """ check if the reader should wait.
+
+    The reader reads at least qlength notes per buzzer and continues until
+    the queued notes cover the horizon, unless free memory is low or the
+    queue is full.
+    """
+    n = len(self._queue)
+    if n < self._qmin:
+      return False
+    if (n >= self._queue.size or self._mem_low or
+        not self._started.is_set()):
+      return True
+    return ticks_diff(ticks_add(self._start,self._last-self._doffset),
+                      ticks_ms()) >= self._horizon
+
+  def _slack(self,now):
+    """ return time until the next note is due (ms), -1: no deadline """
+    if not self._started.is_set() or not len(self._queue):
+      return -1
+    head = self._queue.peek()
+    if head is None:
+      return -1
+    return max(0,ticks_diff(ticks_add(self._start,head[0]),now))
+
+  def _end_slice(self,now):
+    """ record the I/O-slice of the reader """
+    if self._snotes and self.trace:
+      self.trace.record_io(ticks_diff(self._sstart,self._start),
+                           ticks_diff(now,self._sstart),
+                           self._snotes,self._sslack)
+
+  async def _slice(self):
+    """ continue or end the I/O-slice of the reader.
+
+    Reading the next note might read from flash, so the reader only
+    continues if the queue has space and the next note is more than
+    IO_GUARD ms away. Otherwise it ends the slice and waits for the
+    dispatcher. Slices are limited to IO_SLICE ms.
+    """
+    now   = ticks_ms()
+    slack = self._slack(now)
+    wait  = self._queue_full() or 0 <= slack <= IO_GUARD
+    if not wait and ticks_diff(now,self._sstart) < IO_SLICE:
+      return
+    self._end_slice(now)
+    self._started.set()
+    if wait:
+      while self._queue_full() or 0 <= self._slack(ticks_ms()) <= IO_GUARD:
+        self._space_avail.clear()
+        await self._space_avail.wait()
+        self.wakeups += 1
+    else:
+      await asyncio.sleep(0)          # let other tasks run
+    self._sstart = ticks_ms()
+    self._snotes = 0
+    self._sslack = self._slack(self._sstart)
+
+  async def _put(self,item,start=0):
+    """ append item to the queue, wait until the next item can be read.
+
+    start: start of the item relative to the start of the first song
+    """
+    self._queue.append(item)
+    self._snotes += 1
+    self._last    = start
+    self._notes_avail.set()
+    await self._slice()
+
+  async def _read(self,start):
+    """ reader task providing notes of all songs to the queue.
+
+    The end of a song (but the last) is marked by a note (end,-1,0): the
+    dispatcher then moves its time reference to the end of the song, so
+    the next song starts without a gap. Since the reader runs ahead of
+    the dispatcher, the head of the next song is already read and parsed
+    while the tail of the current song is playing.
+    """
 
     self._msg("r: starting reader task...")
-    for note in self._reader.load(filename,song,bpm,ref):
-      while len(self._queue) >= self._qlimit:
-        await asyncio.sleep(0)
-      self._msg(f"r: appending note: {note}")
-      #self._queue.appendleft(note)
-      self._queue.insert(0,note)
-      await asyncio.sleep(0)
+    first  = self.song
+    offset = 0                         # sum of song-ends queued
+    self._sstart = ticks_ms()
+    self._snotes = 0
+    self._sslack = -1
+    await self._slice()
+    while True:
+      count = 0
+      for index in range(first,len(self._songs)):
+        filename, song, bpm, ref = self._songs[index]
+        end = 0
+        notes = self._reader.load(filename,song,bpm,ref,start)
+        if self.optimizer:
+          notes = self.optimizer.run(notes)
+        for note in notes:
+          if self._debug:
+            self._msg(f"r: appending note: {note}")
+          await self._put(note,offset+note[0])
+          if end < note[0] + note[2]:
+            end = note[0] + note[2]
+          count += 1
+        start = 0
+        if index < len(self._songs)-1 or self._loop:
+          if self._debug:
+            self._msg(f"r: end of song {index}, next song at {end}ms")
+          await self._put((end,-1,0),offset+end)
+          offset += end
+      first = 0
+      if not self._loop or not count:
+        break
     self._msg("r: no more notes, appending None...")
-    #self._queue.appendLeft(None)   # signal end
-    self._queue.insert(0,None)   # signal end
+    self._queue.append(None)           # signal end (_slice(): has space)
+    self._notes_avail.set()
+    self._end_slice(ticks_ms())
+    self._started.set()
     self._msg("r: end of reader task...")
 
   # --- dispatcher task   ----------------------------------------------------
 
-  async def _dispatch(self):
+  async def _dispatch(self,start):
     """ dispatcher task providing notes to the buzzers """
 
     self._msg("d: starting dispatcher task...")
-    self._start  = time.monotonic()
+    await self._started.wait()         # initial read-ahead
+    self._start  = ticks_add(ticks_ms(),-int(start*1000))
+    if self._pstart is not None:     # started while paused (seek)
+      self._pstart = ticks_ms()
     end_of_music = self._start
-    note_nr = 0
     while True:
+      self.wakeups += 1
 
       # check for pause
-      while self._pause:
-        await asyncio.sleep(0)
+      if self._pause:
+        await self._resumed.wait()
+        continue
 
       # fix relative time reference in case of pause
-      if self._pstart:
-        self._start += time.monotonic() - self._pstart  # elapsed during pause
-        self._pstart = 0
+      if self._pstart is not None:
+        self._start = ticks_add(self._start,       # elapsed during pause
+                                ticks_diff(ticks_ms(),self._pstart))
+        self._pstart = None
 
       # check for empty queue
       if not len(self._queue):     # nothing to play
-        await asyncio.sleep(0)
+        self._notes_avail.clear()
+        await self._notes_avail.wait()
         continue
 
       # check for end of music and finish task
-      if self._queue[-1] is None:  # end of music
+      if self._queue.peek() is None:  # end of music
         self._msg(f"d: end of music")
-        self._queue.pop()
+        self._queue.popleft()
         # wait for music to finish
-        await asyncio.sleep(max(0,end_of_music-time.monotonic()))
+        await asyncio.sleep(max(0,ticks_diff(end_of_music,ticks_ms()))/1000)
         self._msg(f"d: dispatcher task finished")
         self.stop()
         return
 
-      # peek at first note in queue, sleep until due
-      rtime = time.monotonic() - self._start  # relative time
-      if rtime < self._queue[-1][0]:
-        self._msg(
-          f"d: nothing due, waiting for {self._queue[-1][0]-rtime:.3}s...")
-        await asyncio.sleep(self._queue[-1][0]-rtime)
-
-      # now at least one note is due: dispatch notes to buzzers
+      # peek at first note in queue, sleep until due (absolute deadline).
+      # Long gaps are used for garbage collection, so collections don't
+      # delay the onset of notes.
+      due   = self._queue.peek()[0]
+      delay = ticks_diff(ticks_add(self._start,due),ticks_ms())
+      if delay >= GC_GAP and self._gc_due():
+        self._collect()
+        delay = ticks_diff(ticks_add(self._start,due),ticks_ms())
+      if delay > 0:
+        if self._debug:
+          self._msg(f"d: nothing due, waiting for {delay}ms...")
+        await asyncio.sleep(delay/1000)
+
+      # now at least one note is due: dispatch notes to buzzers. All notes
+      # due are passed to the buzzers first and then switched on in one
+      # batch (see _sound()), so the notes of a chord start together.
       self._msg(f"d: dispatching notes")
-      rtime = time.monotonic() - self._start
+      rtime = ticks_diff(ticks_ms(),self._start)  # relative time
       while (not self._pause and len(self._queue) and
-             self._queue[-1] is not None and rtime >= self._queue[-1][0]):
-        note = self._queue.pop()
-        note_nr += 1
-        self._msg(f"   waiting for buzzer...")
-        bnr,b = await self._free_buzzer()
+             self._queue.peek() is not None and
+             rtime >= self._queue.peek()[0]):
+        note = self._queue.popleft()
+        self._space_avail.set()
+        if note[1] < 0:              # end of song: next song starts now
+          self._start = ticks_add(self._start,note[0])
+          self._doffset += note[0]
+          rtime = ticks_diff(ticks_ms(),self._start)
+          self.song = (self.song+1) % len(self._songs)
+          if self._debug:
+            self._msg(f"d: starting song {self.song}")
+          continue
+        self._note_nr += 1
+        if len(note) > 3 and note[3] < self._nvoices:
+          bnr,b = self._voice_buzzer(note[3])
+        else:
+          if self._batch and not self._has_free():
+            self._sound()              # don't delay batch while waiting
+          self._msg(f"   waiting for buzzer...")
+          bnr,b = await self._free_buzzer(note)
         if not b:
-          self._msg(f"   skipping note {note_nr}: {note}")
+          if self._debug:
+            self._msg(f"   skipping note {self._note_nr}: {note}")
+          if self.trace:
+            self.trace.record(self._note_nr,note[0],
+                              ticks_diff(ticks_ms(),self._start),
+                              -1,len(self._queue))
           continue
-        self._msg(f"   playing note {note_nr} on buzzer {bnr}: {note}")
-        t = asyncio.create_task(b.tone(*note[1:]))
-        rtime = time.monotonic() - self._start
-        end_of_music = max(end_of_music,time.monotonic()+note[2])
+        if self._debug:
+          self._msg(
+            f"   playing note {self._note_nr} on buzzer {bnr}: {note}")
+        b.play(note[1],note[2]/1000,self._volume,on_end=self._on_end)
+        if not self._batch and self.trace:
+          self._bcount = self.trace.count
+        self._batch.append(b)
+        now = ticks_ms()
+        rtime = ticks_diff(now,self._start)
+        if self.trace:
+          self.trace.record(self._note_nr,note[0],rtime,bnr,len(self._queue))
+        end = ticks_add(now,note[2])
+        self.vstart[bnr] = now
+        self.vend[bnr]   = end
+        self.vpitch[bnr] = note[1]
+        if ticks_less(end_of_music,end):
+          end_of_music = end
+      if self._batch:
+        self._sound()
       self._msg(f"d: dispatching done")
 
   # ---  play   --------------------------------------------------------------
 
-  async def play(self,filename=None, song=None, bpm=None, ref=None, loop=False):
+  async def play(self,filename=None, song=None, bpm=None, ref=None, loop=False,
+                 start=0):
     """ play music.
 
     filename: read notes from given file (None otherwise)
@@ -182,6 +572,7 @@ class MusicPlayer:
     bpm: beats-per-minute
     ref: reference note for bpm (e.g. 0.25 for quarter note)
     loop: False|True
+    start: start position in seconds (loops restart at the beginning)
 
     The defaults for bpm/ref are 60/0.25. When reading from a file,
     bpm=None/ref=None will either use the defaults, or any values found
@@ -189,47 +580,137 @@ class MusicPlayer:
     from the file.
     """
 
+    await self._play([(filename,song,bpm,ref)],loop,start)
+
+  # ---  play a list of songs   ----------------------------------------------
+
+  async def playlist(self,songs,loop=False,start=0):
+    """ play a list of songs without gaps.
+
+    songs: list of filenames or of dicts with the arguments of play()
+           (filename, song, bpm, ref)
+    loop: False|True (restart with the first song after the last song)
+    start: start position in seconds within the first song
+
+    The player keeps running across songs: the next song starts exactly
+    at the end of the last note of the previous song. The attribute
+    'song' is the index of the current song.
+    """
+
+    items = []
+    for item in songs:
+      if isinstance(item,str):
+        items.append((item,None,None,None))
+      else:
+        items.append((item.get('filename',None),item.get('song',None),
+                      item.get('bpm',None),item.get('ref',None)))
+    await self._play(items,loop,start)
+
+  # ---  play songs   --------------------------------------------------------
+
+  async def _play(self,songs,loop,start):
+    """ play songs (list of (filename,song,bpm,ref)) """
+
+    self._songs   = songs
+    self._loop    = loop
+    self.song     = 0
     self._stop    = False
     self._pause   = False
-    self._pstart  = 0
+    self._pstart  = None
+    self._seek    = None
+    self.wakeups  = 0
+    self._note_nr  = 0
+    self._gc_last  = ticks_ms()
+    self._gc_alloc = max(0,_memory(alloc=True)) if self.trace else 0
+    self._gc_notes = 0
+    self._resumed.set()
+    if self.trace:
+      self.trace.clear()
     self.init()
 
     while True:
       self._msg("p: starting play")
+      self._last    = 0
+      self._doffset = 0
+      self._started.clear()
       self._tasks.extend(
-        [asyncio.create_task(self._read(filename,song,bpm,ref)),
-         asyncio.create_task(self._dispatch()),
+        [asyncio.create_task(self._guard(self._read,start)),
+         asyncio.create_task(self._guard(self._dispatch,start)),
          asyncio.create_task(self._gc())])
-      await asyncio.gather(*self._tasks)
+      self._tasks.extend([buzzer.start() for buzzer in self._buzzers])
+      self._free  = list(range(len(self._buzzers)-1,-1,-1))*self._voices
+      self._nfree = [self._voices]*len(self._buzzers)
+      self._taken = [0]*len(self._buzzers)
+      # stop() cancels tasks: only report real errors
+      results = await asyncio.gather(*self._tasks,return_exceptions=True)
+      for result in results:
+        if isinstance(result,Exception):
+          raise result
       self._msg("p: play finished")
-      if not loop:
+      if self._seek is None:
         break
+      start, self._seek = self._seek, None   # restart at new position
+      self._stop = False
+      self._queue.clear()
+
+  # --- stop player if a task fails   ---------------------------------------
+
+  async def _guard(self,task,*args):
+    """ run task(*args), stop all other tasks if it raises an error """
+    try:
+      await task(*args)
+    except Exception:
+      self.stop()
+      raise
 
   # --- stop song   ----------------------------------------------------------
 
   def stop(self):
     """ stop the player """
+    try:
+      current = asyncio.current_task()  # a task can't cancel itself
+    except:
+      current = None
+    for buzzer in self._buzzers:
+      buzzer.stop()
     for t in self._tasks:
       try:
-        if not t.done():
+        if not t.done() and t is not current:
           t.cancel()
       except:
         pass
     self._tasks =  []
     self._stop = True
 
+  # --- seek   ---------------------------------------------------------------
+
+  def seek(self,position):
+    """ continue playing at the given position (seconds) of the current
+    song.
+
+    All tasks are restarted, notes still sounding at the new position
+    are played for their remaining duration. Seeking in compiled songs
+    (.bzm) is fast, text is parsed from the beginning.
+    """
+    if not self._tasks:
+      return
+    self._seek = position
+    self.stop()
+
   # --- pause song   ----------------------------------------------------------
 
   def pause(self):
     """ pause the player """
     self._pause  = True
-    self._pstart = time.monotonic()
+    self._pstart = ticks_ms()
+    self._resumed.clear()
 
   # --- resume song   --------------------------------------------------------
 
   def resume(self):
     """ resume playing after pause """
     self._pause = False
+    self._resumed.set()
 
   # --- init buzzers   -------------------------------------------------------
 
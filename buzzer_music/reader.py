@@ -8,6 +8,16 @@
 # tools/preprocess-mucic.sh. When reading from a string, the header
 # ('Online Sequencer:123456:') and the trailing ':' need to be removed manually.
 #
+# Text is parsed in place by the Tokenizer (no temporary strings), pitches
+# are returned as pitch-indices (see pitch.NAMES).
+#
+# Files with the extension .bzm are compiled songs (see songfile.py). They
+# are read with fixed-size records.
+#
+# Files with the extension .mid are Standard MIDI Files (see midi.py). They
+# are streamed track by track, bpm and ref are ignored (tempo is taken from
+# the file).
+#
 # Author: Bernhard Bablok
 # License: GPL3
 #
@@ -18,86 +28,278 @@
 """ Implementation of class MusicReader """
 
 import os
+import struct
+from buzzer_music import songfile
+from buzzer_music import midi
+from buzzer_music.tokenizer import Tokenizer
+from buzzer_music.reorder   import ReorderBuffer
+from buzzer_music.pitch     import NAMES
 
 BUF_SIZE = 4096
+STR_CHUNK = 256    # number of characters parsed at once from strings
+BIN_RECORDS = 32   # number of records read at once from compiled songs
+RUN_RECORD  = "<dBdB" # start, pitch-index, duration, voice of sorted runs
 
 class MusicReader:
   """ read notes from a file or a string """
 
-  def __init__(self):
-    """ constructor """
+  def __init__(self,window=64,ticks=False,cache=None):
+    """ constructor.
+
+    window: size of the reorder-buffer for unsorted songs (0: unlimited)
+    ticks: if True, return start and duration as integer milliseconds,
+           else as seconds (float)
+    cache: SongCache for parsed songs (None: parse every time)
+    """
+
+    self._window = window
+    self._ticks  = ticks
+    self.cache   = cache
 
   # --- load song from a file or string   ------------------------------------
 
-  def load(self,filename=None, song=None, bpm=None, ref=None):
-    """ load music from a file or a given string """
+  def load(self,filename=None, song=None, bpm=None, ref=None, start=0):
+    """ load music from a file or a given string.
+
+    Yields notes (start,pitch-index,duration). Notes with a pre-assigned
+    voice (see tools/analyze_music.py) have the voice as fourth element.
+
+    start: position in seconds. Notes before start are skipped, notes
+           still sounding at start are shortened to start at start.
+           Compiled songs seek in constant time, text is parsed from
+           the beginning.
+    """
 
     if filename is None and song is None:
       raise ValueError("must provide either filename or song as string")
 
+    entry = None
+    if self.cache is not None:
+      key   = (filename,song,bpm,ref,self._ticks)
+      entry = self.cache.get(key)
+    if entry is not None:
+      notes = self.cache.notes(entry)
+    elif start and filename and filename.endswith(".bzm"):
+      notes = self._read_bin(filename,bpm,ref,start)
+    elif self.cache is not None and not start:
+      notes = self.cache.record(key,self._notes(filename,song,bpm,ref),
+                                'l' if self._ticks else 'f')
+    else:
+      notes = self._notes(filename,song,bpm,ref)
+
+    if start:
+      yield from self._skip_to(notes,
+                               int(start*1000) if self._ticks else start)
+    else:
+      yield from notes
+
+  # --- parse notes of a file or string   ------------------------------------
+
+  def _notes(self,filename,song,bpm,ref):
+    """ parse notes of a file or a string """
+
     if filename is None:
       bpm = bpm if bpm else 60
       ref = ref if ref else 0.25
-      yield from self._load(song,60*ref/bpm)
+      yield from self._load(song,60*ref/bpm*(1000 if self._ticks else 1))
+    elif filename.endswith(".bzm"):
+      yield from self._read_bin(filename,bpm,ref)
+    elif filename.endswith(".mid"):
+      yield from midi.read(filename,self._ticks)
     else:
-      yield from self._read(filename,bpm,ref)
+      yield from ReorderBuffer(self._window).sort(
+        self._read(filename,bpm,ref))
 
   # --- read song from a file   ----------------------------------------------
 
   def _read(self,filename,bpm=None,ref=None):
     """ read and parse a file with notes """
 
-    btime = None
-    with open(filename,"rt") as file:
-      for note in file:
-        if not note or note[0] == "#":  # skip empty lines and comments
-          continue
-        elif "bpm" in note:
-          if not bpm:
-            bpm = int(note.split("=")[1])
-          continue
-        elif "ref" in note:
-          if not ref:
-            ref = float(note.split("=")[1])
-          continue
-        t, pitch, duration, *_ = note.split(" ")   # ignore instrument
-        if not btime:
-          btime = 60*(ref if ref else 0.25)/(bpm if bpm else 60)
-        yield float(t)*btime, pitch, float(duration)*btime
+    yield from self._tokenize(filename,Tokenizer(bpm,ref,ticks=self._ticks))
+
+  # --- tokenize a file   ----------------------------------------------------
+
+  def _tokenize(self,filename,tokenizer):
+    """ parse a file in chunks of BUF_SIZE bytes """
+
+    buffer = bytearray(BUF_SIZE)
+    view   = memoryview(buffer)
+    end    = 0
+    with open(filename,"rb") as file:
+      while True:
+        n = file.readinto(view[end:])
+        final = not n
+        if n:
+          end += n
+        tokenizer.pos = 0
+        yield from tokenizer.notes(buffer,end,final)
+        if final:
+          break
+        # move incomplete record to the start of the buffer
+        rest = end - tokenizer.pos
+        if rest == BUF_SIZE:
+          raise ValueError(f"line too long (max: {BUF_SIZE} bytes)")
+        buffer[0:rest] = buffer[tokenizer.pos:end]
+        end = rest
+
+  # --- sort a file (external merge-sort)   ---------------------------------
+
+  def sort(self,infile,outfile,run=256):
+    """ sort a badly unsorted file with notes.
+
+    The notes are sorted in runs of the given size which are written to
+    temporary files (outfile.0, outfile.1, ...). The runs are then merged
+    into outfile. So memory is bounded by the run-size, but the
+    filesystem must be writable.
+    """
+
+    # create sorted runs
+    tokenizer = Tokenizer()
+    tokenizer.btime = 1                      # keep raw steps
+    runs = []
+    notes = []
+    for note in self._tokenize(infile,tokenizer):
+      notes.append(note)
+      if len(notes) == run:
+        runs.append(self._write_run(outfile,len(runs),notes))
+    if notes:
+      runs.append(self._write_run(outfile,len(runs),notes))
+
+    # merge runs
+    files = [open(name,"rb") for name in runs]
+    size  = struct.calcsize(RUN_RECORD)
+    heap  = ReorderBuffer(0)
+    try:
+      for index,file in enumerate(files):
+        heap.push(struct.unpack(RUN_RECORD,file.read(size))+(index,))
+      with open(outfile,"wt") as out:
+        if tokenizer.bpm:
+          bpm = tokenizer.bpm
+          out.write(f"bpm = {int(bpm) if bpm == int(bpm) else bpm}\n")
+        if tokenizer.ref:
+          out.write(f"ref = {tokenizer.ref}\n")
+        while len(heap):
+          t, pitch, duration, voice, index = heap.pop()
+          if voice == songfile.NO_VOICE:
+            out.write(f"{t} {NAMES[pitch]} {duration}\n")
+          else:
+            out.write(f"{t} {NAMES[pitch]} {duration} 0 {voice}\n")
+          record = files[index].read(size)
+          if record:
+            heap.push(struct.unpack(RUN_RECORD,record)+(index,))
+    finally:
+      for file in files:
+        file.close()
+      for name in runs:
+        os.remove(name)
+
+  # --- write a sorted run   -------------------------------------------------
+
+  def _write_run(self,outfile,index,notes):
+    """ sort notes and write them to a temporary file, clear notes """
+
+    name = f"{outfile}.{index}"
+    notes.sort(key=lambda note: note[0])
+    with open(name,"wb") as file:
+      for note in notes:
+        voice = note[3] if len(note) > 3 else songfile.NO_VOICE
+        file.write(struct.pack(RUN_RECORD,note[0],note[1],note[2],voice))
+    notes.clear()
+    return name
+
+  # --- read compiled song from a file   -------------------------------------
+
+  def _read_bin(self,filename,bpm=None,ref=None,start=0):
+    """ read a compiled song with fixed-size records.
+
+    start: position in seconds, the index of the file is used to read
+           only the records still sounding and the records from the last
+           checkpoint on (see songfile.find)
+    """
+
+    with open(filename,"rb") as file:
+      rsize, resolution, fbpm, fref, count = songfile.read_header(file)
+      bpm = bpm if bpm else (fbpm if fbpm else 60)
+      ref = ref if ref else (fref if fref else 0.25)
+      btime = 60*ref/bpm/resolution
+      ticks = self._ticks
+      scale = btime*1000 if ticks else btime
+      buffer = bytearray(rsize*BIN_RECORDS)
+      if start:
+        first, sounding = songfile.find(file,rsize,count,int(start/btime))
+        for record in sounding:
+          file.seek(songfile.HEADER_SIZE + record*rsize)
+          file.readinto(buffer)
+          yield self._bin_note(buffer,0,scale,ticks)
+        file.seek(songfile.HEADER_SIZE + first*rsize)
+        count -= first
+      while count > 0:
+        n = file.readinto(buffer)
+        if not n:
+          break
+        n = min(n-n%rsize,count*rsize)     # don't read the index
+        count -= n//rsize
+        for pos in range(0,n,rsize):
+          yield self._bin_note(buffer,pos,scale,ticks)
+
+  def _bin_note(self,buffer,pos,scale,ticks):
+    """ convert the record at pos of buffer to a note """
+    start, duration, pitch, voice = struct.unpack_from(
+      songfile.RECORD,buffer,pos)
+    if ticks:
+      start    = int(start*scale+0.5)
+      duration = int(duration*scale+0.5)
+    else:
+      start    = start*scale
+      duration = duration*scale
+    if voice == songfile.NO_VOICE:
+      return start, pitch, duration
+    return start, pitch, duration, voice
+
+  # --- skip to start position   ---------------------------------------------
+
+  def _skip_to(self,notes,start):
+    """ skip notes before start, shorten notes still sounding at start """
+
+    for note in notes:
+      if note[0] >= start:
+        yield note
+      elif note[0] + note[2] > start:
+        yield (start,note[1],note[0]+note[2]-start) + note[3:]
 
   # --- load song from a string   --------------------------------------------
 
   def _load(self,song,btime):
-    """ load music from a file or a given string """
+    """ load music from a given string, restoring time order """
 
-    song = song.replace("\n","").replace("\r","")
-    if song[-1] != ';':
-      song += ';'
-    notes = [note for note in self._parse(song,btime) if note]
-    notes.sort(key=lambda note: note[0])
-    yield from notes
+    yield from ReorderBuffer(self._window).sort(self._stream(song,btime))
+
+  # --- stream song from a string   ------------------------------------------
+
+  def _stream(self,song,btime):
+    """ parse song in windows of STR_CHUNK characters """
+
+    rest = ""
+    for pos in range(0,len(song),STR_CHUNK):
+      for note in self._parse(rest+song[pos:pos+STR_CHUNK],btime):
+        if isinstance(note,str):
+          rest = note
+        else:
+          yield note
+    for note in self._parse(rest+";",btime):
+      if not isinstance(note,str):
+        yield note
 
   # --- parse song   ---------------------------------------------------------
 
   def _parse(self,buffer,btime):
     """ parse song-fragment """
 
-    buffer = buffer.lstrip(";")
-    notes = buffer.split(";")
-    # If we have a complete note with trailing ';', then the last note is empty
-    # Otherwise, the last note is (maybe) incomplete, so we return it for
-    # later processing.
-    if not notes[-1] or len(notes[-1].split(" ")) != 4:
-      rest = notes.pop()
-    else:
-      rest = ""
-
-    # at a given t, we can have multiple notes. So create a list of lists
-    # with one list of notes for every given t
-    for note in notes:
-      try:
-        t, pitch, duration, *_ = note.split(" ")   # ignore instrument
-        yield float(t)*btime, pitch, float(duration)*btime
-      except:
-        raise
-    yield rest
+    # If the fragment ends with a complete note (trailing ';'), the rest is
+    # empty. Otherwise, the last note is (maybe) incomplete, so we return it
+    # for later processing.
+    buffer = buffer.encode()
+    tokenizer = Tokenizer(lines=False,ticks=self._ticks)
+    tokenizer.btime = btime
+    yield from tokenizer.notes(buffer,len(buffer),False)
+    yield buffer[tokenizer.pos:].decode()
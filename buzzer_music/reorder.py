@@ -0,0 +1,99 @@
+# ----------------------------------------------------------------------------
+# The ReorderBuffer class restores the time order of a stream of notes
+# that is only partially sorted.
+#
+# The buffer is a bounded min-heap (keyed on the start of the note). A note
+# is only returned once the buffer is full, so notes can arrive up to 'size'
+# positions too late. A note arriving later than that cannot be placed
+# correctly anymore and raises a ValueError.
+#
+# Author: Bernhard Bablok
+# License: GPL3
+#
+# Website: https://github.com/bablokb/cp-buzzer-music
+#
+# ----------------------------------------------------------------------------
+
+""" Implementation of class ReorderBuffer """
+
+class ReorderBuffer:
+  """ bounded min-heap for notes """
+
+  def __init__(self,size=64):
+    """ constructor.
+
+    size: maximum number of buffered notes (0: unlimited, i.e. full sort)
+    """
+
+    self._size = size
+    self._heap = []
+    self._last = None    # start of last note returned
+
+  # --- number of buffered notes   ------------------------------------------
+
+  def __len__(self):
+    """ number of buffered notes """
+    return len(self._heap)
+
+  # --- add note   -----------------------------------------------------------
+
+  def push(self,note):
+    """ add note to the heap """
+
+    if self._last is not None and note[0] < self._last:
+      raise ValueError(
+        f"note {note} outside of reorder window ({self._size} notes): "
+        "increase window or sort the notes")
+    heap = self._heap
+    heap.append(note)
+    pos = len(heap) - 1
+    while pos:
+      parent = (pos-1) >> 1
+      if heap[parent][0] <= note[0]:
+        break
+      heap[pos] = heap[parent]
+      pos = parent
+    heap[pos] = note
+
+  # --- first note   ---------------------------------------------------------
+
+  def peek(self):
+    """ return first note without removing it """
+    return self._heap[0]
+
+  # --- remove first note   --------------------------------------------------
+
+  def pop(self):
+    """ remove and return first note """
+
+    heap = self._heap
+    first = heap[0]
+    last  = heap.pop()
+    n = len(heap)
+    if n:
+      pos = 0
+      while True:
+        child = 2*pos + 1
+        if child >= n:
+          break
+        if child+1 < n and heap[child+1][0] < heap[child][0]:
+          child += 1
+        if last[0] <= heap[child][0]:
+          break
+        heap[pos] = heap[child]
+        pos = child
+      heap[pos] = last
+    self._last = first[0]
+    return first
+
+  # --- sort stream of notes   -----------------------------------------------
+
+  def sort(self,notes):
+    """ yield the given notes in time order """
+
+    for note in notes:
+      self.push(note)
+      if self._size and len(self._heap) > self._size:
+        yield self.pop()
+    while self._heap:
+      yield self.pop()
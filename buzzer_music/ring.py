@@ -0,0 +1,62 @@
+# ----------------------------------------------------------------------------
+# The Ring class is a preallocated FIFO-queue (ring buffer).
+#
+# Appending and removing items is O(1) and does not allocate memory, in
+# contrast to list.insert(0,item) (collections.deque of CircuitPython
+# seems to have problems).
+#
+# Author: Bernhard Bablok
+# License: GPL3
+#
+# Website: https://github.com/bablokb/cp-buzzer-music
+#
+# ----------------------------------------------------------------------------
+
+""" Implementation of class Ring """
+
+class Ring:
+  """ preallocated FIFO-queue """
+
+  def __init__(self,size):
+    """ constructor.
+
+    size: maximal number of items
+    """
+
+    self.size   = size
+    self._items = [None]*size
+    self._head  = 0                   # oldest item
+    self._count = 0
+
+  def __len__(self):
+    return self._count
+
+  def append(self,item):
+    """ add item at the end """
+    if self._count == self.size:
+      raise IndexError("ring is full")
+    self._items[(self._head+self._count) % self.size] = item
+    self._count += 1
+
+  def peek(self):
+    """ return oldest item """
+    if not self._count:
+      raise IndexError("ring is empty")
+    return self._items[self._head]
+
+  def popleft(self):
+    """ remove and return oldest item """
+    if not self._count:
+      raise IndexError("ring is empty")
+    item = self._items[self._head]
+    self._items[self._head] = None
+    self._head   = (self._head+1) % self.size
+    self._count -= 1
+    return item
+
+  def clear(self):
+    """ remove all items """
+    for i in range(self.size):
+      self._items[i] = None
+    self._head  = 0
+    self._count = 0
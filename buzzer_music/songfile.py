@@ -0,0 +1,154 @@
+# ----------------------------------------------------------------------------
+# Definition of the compiled song format (extension .bzm).
+#
+# A compiled song is a small header followed by fixed-size records sorted
+# by start. Times are integer ticks (RESOLUTION ticks per step of the
+# onlinesequencer notation), pitches are indices into pitch.NAMES. Since the
+# header keeps bpm/ref of the source, bpm/ref can still be changed at
+# load time.
+#
+# The records are followed by an index for seeking: checkpoints every
+# INDEX_STEPS steps with the number of the first record starting at or
+# after the checkpoint and the numbers of the records still sounding at the
+# checkpoint (so a long note does not force reading from its record on).
+# Files without index are valid (seeking is then linear).
+#
+# Use tools/compile_music.py to create compiled songs.
+#
+# Author: Bernhard Bablok
+# License: GPL3
+#
+# Website: https://github.com/bablokb/cp-buzzer-music
+#
+# ----------------------------------------------------------------------------
+
+""" constants and helpers for compiled songs """
+
+import struct
+
+MAGIC       = b"BZM1"
+HEADER      = "<4sHHHfI"  # magic, record-size, resolution, bpm, ref, count
+RECORD      = "<IIBB"     # start, duration, pitch-index, voice
+HEADER_SIZE = struct.calcsize(HEADER)
+RECORD_SIZE = struct.calcsize(RECORD)
+RESOLUTION  = 1000        # ticks per step
+NO_VOICE    = 255
+MAX_BPM     = 0xFFFF
+MAX_TICKS   = 0xFFFFFFFF  # maximal start and duration (ticks)
+
+INDEX_MAGIC  = b"BZI2"
+INDEX_HEADER = "<4sII"    # magic, interval between checkpoints (ticks), entries
+INDEX_ENTRY  = "<III"     # first record starting at the checkpoint,
+                          # position and number of sounding records
+INDEX_RECORD = "<I"       # number of a sounding record
+INDEX_HEADER_SIZE = struct.calcsize(INDEX_HEADER)
+INDEX_ENTRY_SIZE  = struct.calcsize(INDEX_ENTRY)
+INDEX_RECORD_SIZE = struct.calcsize(INDEX_RECORD)
+INDEX_STEPS  = 16         # steps between checkpoints
+
+# --- read and check header   ------------------------------------------------
+
+def read_header(file):
+  """ read header, return (record-size,resolution,bpm,ref,count) """
+
+  magic, *header = struct.unpack(HEADER,file.read(HEADER_SIZE))
+  if magic != MAGIC:
+    raise ValueError("not a compiled song")
+  return header
+
+# --- write compiled song   --------------------------------------------------
+
+def write(file,notes,bpm=0,ref=0,resolution=RESOLUTION):
+  """ write notes (start,pitch-index,duration[,voice]) to a binary file.
+
+  Notes must be sorted by start. start and duration are in steps,
+  bpm=0/ref=0 mean 'use defaults'. Values out of range raise a ValueError.
+  """
+
+  if not 0 <= bpm <= MAX_BPM:
+    raise ValueError(f"bpm {bpm} out of range (0-{MAX_BPM})")
+  file.write(struct.pack(HEADER,MAGIC,RECORD_SIZE,resolution,
+                         bpm,ref,len(notes)))
+  records = []
+  for nr,note in enumerate(notes,1):
+    voice = note[3] if len(note) > 3 and note[3] is not None else NO_VOICE
+    record = (int(round(note[0]*resolution)),
+              int(round(note[2]*resolution)),note[1],voice)
+    if (not 0 <= record[0] <= MAX_TICKS or not 0 <= record[1] <= MAX_TICKS or
+        not 0 <= record[3] <= NO_VOICE):
+      raise ValueError(f"note {nr} (sorted): {note} out of range")
+    records.append(record)
+    file.write(struct.pack(RECORD,*record))
+  _write_index(file,records,INDEX_STEPS*resolution)
+
+# --- write index   ----------------------------------------------------------
+
+def _write_index(file,records,interval):
+  """ write index of checkpoints after the records """
+
+  entries  = []                         # (first,position,count)
+  sounding = []                         # numbers of sounding records
+  n        = len(records)
+  last     = records[-1][0] if n else -1
+  first    = 0                          # first record starting at checkpoint
+  active   = []                         # records started before checkpoint
+  for k in range(last//interval+1):
+    c = k*interval
+    while first < n and records[first][0] < c:
+      active.append(first)
+      first += 1
+    active = [r for r in active if records[r][0]+records[r][1] > c]
+    entries.append((first,len(sounding),len(active)))
+    sounding.extend(active)
+  file.write(struct.pack(INDEX_HEADER,INDEX_MAGIC,interval,len(entries)))
+  for entry in entries:
+    file.write(struct.pack(INDEX_ENTRY,*entry))
+  for record in sounding:
+    file.write(struct.pack(INDEX_RECORD,record))
+
+# --- find records for a given start   ---------------------------------------
+
+def find(file,rsize,count,start):
+  """ return (first,sounding) to play from start.
+
+  first is the number of the first record starting at or after the last
+  checkpoint before start, sounding is a list of the numbers of records
+  still sounding at the checkpoint. start is in ticks. Uses the index
+  (constant time), returns (0,[]) if the file has no index.
+  """
+
+  base = HEADER_SIZE + count*rsize
+  file.seek(base)
+  data = file.read(INDEX_HEADER_SIZE)
+  if len(data) < INDEX_HEADER_SIZE:
+    return 0, []
+  magic, interval, entries = struct.unpack(INDEX_HEADER,data)
+  if magic != INDEX_MAGIC or not entries:
+    return 0, []
+  k = min(start//interval,entries-1)
+  file.seek(base + INDEX_HEADER_SIZE + k*INDEX_ENTRY_SIZE)
+  first, pos, n = struct.unpack(INDEX_ENTRY,file.read(INDEX_ENTRY_SIZE))
+  file.seek(base + INDEX_HEADER_SIZE + entries*INDEX_ENTRY_SIZE +
+            pos*INDEX_RECORD_SIZE)
+  data = file.read(n*INDEX_RECORD_SIZE)
+  return first, [struct.unpack_from(INDEX_RECORD,data,i*INDEX_RECORD_SIZE)[0]
+                 for i in range(n)]
+
+# --- read compiled song   ---------------------------------------------------
+
+def read(file):
+  """ read all notes from a binary file, return (notes,bpm,ref).
+
+  Notes are (start,pitch-index,duration,voice) with start and duration in
+  steps and voice=None if not assigned. This reads the complete song into
+  memory, use MusicReader for playback.
+  """
+
+  rsize, resolution, bpm, ref, count = read_header(file)
+  notes = []
+  for _ in range(count):
+    start, duration, pitch, voice = struct.unpack_from(RECORD,
+                                                       file.read(rsize))
+    notes.append((start/resolution,pitch,duration/resolution,
+                  None if voice == NO_VOICE else voice))
+  return notes, bpm, ref
@@ -0,0 +1,257 @@
+# ----------------------------------------------------------------------------
+# The Tokenizer class parses notes in place from a byte-buffer.
+#
+# Numbers and pitch-names are converted directly from the bytes of the
+# buffer, so parsing does not create any intermediate strings. Headers
+# (bpm=, ref=) are only recognized at the top of a file.
+#
+# A note is "start pitch duration [instrument [voice]]". The instrument is
+# ignored, the optional voice is a pre-assigned buzzer (see
+# tools/analyze_music.py).
+#
+# Author: Bernhard Bablok
+# License: GPL3
+#
+# Website: https://github.com/bablokb/cp-buzzer-music
+#
+# ----------------------------------------------------------------------------
+
+""" Implementation of class Tokenizer """
+
+# character codes
+_TAB   = 9
+_LF    = 10
+_CR    = 13
+_SPACE = 32
+_HASH  = 35
+_MINUS = 45
+_DOT   = 46
+_SEMI  = 59
+_FLAT  = 98    # 'b'
+_R     = 114   # 'r'
+_ZERO  = 48
+_NINE  = 57
+
+_INT_MAX   = 99999999             # value*10+9 still fits into a small int
+_FLOAT_MAX = 9007199254740992.0   # 2**53: larger floats are not exact
+
+# semitones of the note-letters within an octave
+_SEMITONE = {67:0, 68:2, 69:4, 70:5, 71:7, 65:9, 66:11}
+
+NR_PITCHES = 120
+
+class Tokenizer:
+  """ parse notes from a byte-buffer without creating strings """
+
+  def __init__(self,bpm=None,ref=None,lines=True,ticks=False):
+    """ constructor.
+
+    bpm, ref: explicit values, these override headers
+    lines: if True, a note ends at ';' or the end of a line, otherwise
+           only at ';' (line-breaks are ignored)
+    ticks: if True, return start and duration as integer milliseconds
+    """
+
+    self.pos    = 0
+    self.btime  = None     # calculated at first note if not set
+    self.bpm    = bpm
+    self.ref    = ref
+    self._lines = lines
+    self._ticks = ticks
+    self._header = lines   # headers are only allowed at top of files
+    if lines:
+      self._blanks = (_SPACE,_TAB)
+    else:
+      self._blanks = (_SPACE,_TAB,_LF,_CR)
+
+  # --- find end of current record   -----------------------------------------
+
+  def _eor(self,buf,end):
+    """ return end of record starting at self.pos, or -1 """
+
+    eor = buf.find(b";",self.pos,end)
+    if self._lines:
+      eol = buf.find(b"\n",self.pos,eor if eor > -1 else end)
+      if eol > -1:
+        return eol
+    return eor
+
+  # --- parse a number   -----------------------------------------------------
+
+  def _number(self,buf,end):
+    """ parse number at self.pos and advance self.pos """
+
+    pos   = self.pos
+    sign  = 1
+    value = 0                         # digits as small int, then as float
+    scale = 0                         # number of decimals
+    if buf[pos] == _MINUS:
+      sign = -1
+      pos += 1
+    start = pos
+    while pos < end and _ZERO <= buf[pos] <= _NINE:
+      if value > _INT_MAX:            # continue as float (no long int)
+        value = float(value)
+      value = value*10 + buf[pos] - _ZERO
+      pos += 1
+    if pos < end and buf[pos] == _DOT:
+      pos += 1
+      while pos < end and _ZERO <= buf[pos] <= _NINE:
+        if value > _INT_MAX:
+          value = float(value)
+        value = value*10 + buf[pos] - _ZERO
+        scale += 1
+        pos += 1
+    if pos == start:
+      self._error(buf,end,"number expected")
+    if pos < end and buf[pos] in (69,101):  # exponent: E|e
+      pos += 1
+      esign = 1
+      if pos < end and buf[pos] == _MINUS:
+        esign = -1
+        pos += 1
+      elif pos < end and buf[pos] == 43:     # +
+        pos += 1
+      exp = 0
+      while pos < end and _ZERO <= buf[pos] <= _NINE:
+        exp = exp*10 + buf[pos] - _ZERO
+        pos += 1
+      scale -= esign*exp
+    if value >= _FLOAT_MAX:           # 16+ digits (rare): let float() round
+      value = float(buf[self.pos:pos])
+      self.pos = pos
+      return value
+    # a single division instead of summing up decimals (correctly rounded)
+    value = value/10.0**scale if scale > 0 else value*10.0**-scale
+    self.pos = pos
+    return sign*value
+
+  # --- parse a pitch   ------------------------------------------------------
+
+  def _pitch(self,buf,end):
+    """ parse pitch-name at self.pos, return pitch-index """
+
+    pos = self.pos
+    semitone = _SEMITONE.get(buf[pos],-1)
+    if semitone < 0:
+      self._error(buf,end,"invalid pitch")
+    pos += 1
+    if pos < end and buf[pos] == _HASH:
+      semitone += 1
+      pos += 1
+    elif pos < end and buf[pos] == _FLAT:
+      semitone -= 1
+      pos += 1
+    if pos == end or not _ZERO <= buf[pos] <= _NINE:
+      self._error(buf,end,"invalid pitch")
+    octave = 0
+    while pos < end and _ZERO <= buf[pos] <= _NINE:
+      octave = octave*10 + buf[pos] - _ZERO
+      pos += 1
+    index = 12*octave + semitone
+    if not 0 <= index < NR_PITCHES:
+      self._error(buf,end,"invalid pitch")
+    self.pos = pos
+    return index
+
+  # --- skip blanks   --------------------------------------------------------
+
+  def _skip(self,buf,end):
+    """ skip blanks """
+    pos = self.pos
+    while pos < end and buf[pos] in self._blanks:
+      pos += 1
+    self.pos = pos
+
+  # --- parse header   -------------------------------------------------------
+
+  def _parse_header(self,buf,end):
+    """ parse bpm= or ref= """
+
+    key = buf[self.pos]
+    pos = buf.find(b"=",self.pos,end)
+    if pos < 0:
+      self._error(buf,end,"invalid header")
+    self.pos = pos + 1
+    self._skip(buf,end)
+    value = self._number(buf,end)
+    if key == _FLAT:        # bpm
+      if not self.bpm:
+        self.bpm = value
+    elif not self.ref:
+      self.ref = value
+
+  # --- raise error   --------------------------------------------------------
+
+  def _error(self,buf,end,msg):
+    """ raise ValueError with the offending record """
+
+    start = self.pos
+    while start > 0 and buf[start-1] not in (_SEMI,_LF):
+      start -= 1
+    raise ValueError(f"{msg}: {bytes(buf[start:end]).decode().strip()}")
+
+  # --- parse notes   --------------------------------------------------------
+
+  def notes(self,buf,end,final=True):
+    """ yield notes (start,pitch-index,duration[,voice]) from buf.
+
+    Notes are parsed from buf[self.pos:end], the voice is only returned
+    if the note has a voice-column.
+
+    If final is False, parsing stops before an incomplete record at the
+    end of the buffer. self.pos then points to the start of that record.
+    """
+
+    while self.pos < end:
+      c = buf[self.pos]
+      if c in (_SPACE,_TAB,_SEMI,_LF,_CR):
+        self.pos += 1
+        continue
+
+      if c == _HASH and self._lines:         # comment: skip line
+        eor = buf.find(b"\n",self.pos,end)
+      else:
+        eor = self._eor(buf,end)
+      if eor < 0:
+        if not final:
+          return
+        eor = end
+
+      if c == _HASH:
+        self.pos = eor
+      elif c == _FLAT or c == _R:            # header
+        if not self._header:
+          self._error(buf,eor,"header after first note")
+        self._parse_header(buf,eor)
+        self.pos = eor
+      else:
+        if not self.btime:
+          self.btime = (60*(self.ref if self.ref else 0.25)/
+                        (self.bpm if self.bpm else 60))
+          if self._ticks:
+            self.btime *= 1000
+        self._header = False
+        t = self._number(buf,eor)
+        self._skip(buf,eor)
+        pitch = self._pitch(buf,eor)
+        self._skip(buf,eor)
+        duration = self._number(buf,eor)
+        voice = -1
+        self._skip(buf,eor)
+        if self.pos < eor and _ZERO <= buf[self.pos] <= _NINE:
+          self._number(buf,eor)              # ignore instrument
+          self._skip(buf,eor)
+          if self.pos < eor and _ZERO <= buf[self.pos] <= _NINE:
+            voice = int(self._number(buf,eor))
+        self.pos = eor
+        if self._ticks:
+          t        = int(t*self.btime+0.5)
+          duration = int(duration*self.btime+0.5)
+        else:
+          t        = t*self.btime
+          duration = duration*self.btime
+        if voice < 0:
+          yield t, pitch, duration
+        else:
+          yield t, pitch, duration, voice
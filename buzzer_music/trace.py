@@ -0,0 +1,225 @@
+# ----------------------------------------------------------------------------
+# The Trace class records timing information of dispatched notes.
+#
+# Records are stored in a preallocated ring buffer (one array per field),
+# so recording does not allocate memory. Fields of a record:
+#   note index, scheduled time, actual dispatch time (both in ms relative
+#   to the start of the song), buzzer, queue depth, skew (time in us needed
+#   to switch on all notes of the batch the note was part of)
+#
+# Two smaller ring buffers record garbage collections and I/O-slices of
+# the reader (start, duration, notes read, slack to the next note at the
+# start of the slice, -1: no note was due). Records of collections:
+#   start (ms relative to the start of the song), duration (ms), index of
+#   the last dispatched note, bytes allocated and notes dispatched since
+#   the previous collection, forced (collection did not wait for a gap)
+#
+# Author: Bernhard Bablok
+# License: GPL3
+#
+# Website: https://github.com/bablokb/cp-buzzer-music
+#
+# ----------------------------------------------------------------------------
+
+""" Implementation of class Trace """
+
+from array import array
+
+class Trace:
+  """ ring buffer of timing records """
+
+  def __init__(self,size=256,gc_size=32,io_size=64):
+    """ constructor.
+
+    size: number of records (older records are overwritten)
+    gc_size: number of records of garbage collections
+    io_size: number of records of I/O-slices
+    """
+
+    self.size   = size
+    self.count  = 0                   # total number of records
+    self.note   = array('l',[0]*size)
+    self.sched  = array('l',[0]*size)
+    self.actual = array('l',[0]*size)
+    self.buzzer = array('b',[0]*size)
+    self.depth  = array('H',[0]*size)
+    self.skew   = array('l',[0]*size)
+
+    self.gc_size   = gc_size
+    self.gc_count  = 0
+    self.gc_start  = array('l',[0]*gc_size)
+    self.gc_time   = array('H',[0]*gc_size)
+    self.gc_note   = array('l',[0]*gc_size)
+    self.gc_alloc  = array('l',[0]*gc_size)
+    self.gc_notes  = array('H',[0]*gc_size)
+    self.gc_forced = array('b',[0]*gc_size)
+
+    self.io_size   = io_size
+    self.io_count  = 0
+    self.io_start  = array('l',[0]*io_size)
+    self.io_time   = array('H',[0]*io_size)
+    self.io_notes  = array('H',[0]*io_size)
+    self.io_slack  = array('l',[0]*io_size)
+
+  # --- clear buffer   -------------------------------------------------------
+
+  def clear(self):
+    """ clear buffer """
+    self.count    = 0
+    self.gc_count = 0
+    self.io_count = 0
+
+  # --- add record   ---------------------------------------------------------
+
+  def record(self,note,sched,actual,buzzer,depth):
+    """ add a record """
+    i = self.count % self.size
+    self.note[i]   = note
+    self.sched[i]  = sched
+    self.actual[i] = actual
+    self.buzzer[i] = buzzer
+    self.depth[i]  = depth
+    self.skew[i]   = 0
+    self.count += 1
+
+  def skew_from(self,start,skew):
+    """ set skew of all records added since count was start """
+    for k in range(max(start,self.count-self.size),self.count):
+      self.skew[k % self.size] = skew
+
+  # --- add record of a garbage collection   --------------------------------
+
+  def record_gc(self,start,duration,note,alloc,notes,forced):
+    """ add a record of a garbage collection """
+    i = self.gc_count % self.gc_size
+    self.gc_start[i]  = start
+    self.gc_time[i]   = min(duration,65535)
+    self.gc_note[i]   = note
+    self.gc_alloc[i]  = alloc
+    self.gc_notes[i]  = min(notes,65535)
+    self.gc_forced[i] = forced
+    self.gc_count += 1
+
+  # --- add record of an I/O-slice   -----------------------------------------
+
+  def record_io(self,start,duration,notes,slack):
+    """ add a record of an I/O-slice of the reader """
+    i = self.io_count % self.io_size
+    self.io_start[i] = start
+    self.io_time[i]  = min(duration,65535)
+    self.io_notes[i] = min(notes,65535)
+    self.io_slack[i] = slack
+    self.io_count += 1
+
+  # --- iterate over records   -----------------------------------------------
+
+  def records(self):
+    """ yield records (oldest first) """
+    n = min(self.count,self.size)
+    for k in range(self.count-n,self.count):
+      i = k % self.size
+      yield (self.note[i],self.sched[i],self.actual[i],
+             self.buzzer[i],self.depth[i],self.skew[i])
+
+  def records_gc(self):
+    """ yield records of garbage collections (oldest first) """
+    n = min(self.gc_count,self.gc_size)
+    for k in range(self.gc_count-n,self.gc_count):
+      i = k % self.gc_size
+      yield (self.gc_start[i],self.gc_time[i],self.gc_note[i],
+             self.gc_alloc[i],self.gc_notes[i],self.gc_forced[i])
+
+  def records_io(self):
+    """ yield records of I/O-slices (oldest first) """
+    n = min(self.io_count,self.io_size)
+    for k in range(self.io_count-n,self.io_count):
+      i = k % self.io_size
+      yield (self.io_start[i],self.io_time[i],self.io_notes[i],
+             self.io_slack[i])
+
+  # --- dump records   -------------------------------------------------------
+
+  def dump(self):
+    """ print all records """
+    print("  note  scheduled     actual  late(ms)  buzzer  queue  skew(us)")
+    for note,sched,actual,buzzer,depth,skew in self.records():
+      print(f"{note:6d} {sched/1000:10.3f} {actual/1000:10.3f}"
+            f" {actual-sched:9d} {buzzer:7d} {depth:6d} {skew:9d}")
+    if self.gc_count:
+      print("\n    gc      start  time(ms)   note     alloc  notes  forced")
+      for k,(start,duration,note,alloc,notes,forced) in enumerate(
+        self.records_gc()):
+        print(f"{k:6d} {start/1000:10.3f} {duration:9d} {note:6d}"
+              f" {alloc:9d} {notes:6d} {forced:7d}")
+    if self.io_count:
+      print("\n    io      start  time(ms)  notes  slack(ms)")
+      for k,(start,duration,notes,slack) in enumerate(self.records_io()):
+        print(f"{k:6d} {start/1000:10.3f} {duration:9d} {notes:6d}"
+              f" {slack:10d}")
+
+  # --- summary   ------------------------------------------------------------
+
+  def summary(self):
+    """ return dict with lateness-percentiles and per-buzzer jitter (ms),
+    chord-skew (us) and garbage collections """
+
+    late = sorted(r[2]-r[1] for r in self.records())
+    if not late:
+      return {}
+    result = {'notes': len(late), 'max': late[-1]}
+    for p in (50,90,99):
+      result[f"p{p}"] = late[min(len(late)-1,len(late)*p//100)]
+
+    # jitter: standard deviation of lateness per buzzer
+    sums = {}
+    for r in self.records():
+      if r[3] < 0:
+        continue                         # skipped notes
+      value = r[2]-r[1]
+      n, s, s2 = sums.get(r[3],(0,0.0,0.0))
+      sums[r[3]] = (n+1,s+value,s2+value*value)
+    result['jitter'] = {
+      buzzer: max(0,s2/n-(s/n)**2)**0.5 for buzzer,(n,s,s2) in sums.items()}
+    skew = sorted(r[5] for r in self.records() if r[3] >= 0)
+    result['skew'] = {'max': skew[-1] if skew else 0}
+    for p in (50,99):
+      result['skew'][f"p{p}"] = (
+        skew[min(len(skew)-1,len(skew)*p//100)] if skew else 0)
+    result['gc'] = self.summary_gc()
+    result['io'] = self.summary_io()
+    return result
+
+  # --- summary of garbage collections   -------------------------------------
+
+  def summary_gc(self):
+    """ return dict with number and duration of collections, allocation
+    per note and the number of notes that were due during a collection """
+
+    n = forced = max_time = alloc = notes = overlaps = 0
+    for start,duration,note,nbytes,nnotes,nforced in self.records_gc():
+      n        += 1
+      forced   += nforced
+      max_time  = max(max_time,duration)
+      alloc    += nbytes
+      notes    += nnotes
+      for r in self.records():
+        if r[0] > note and r[1] < start+duration:
+          overlaps += 1
+    return {'collections': n, 'forced': forced, 'max': max_time,
+            'alloc/note': alloc/notes if notes else 0, 'overlaps': overlaps}
+
+  # --- summary of I/O-slices   ----------------------------------------------
+
+  def summary_io(self):
+    """ return dict with number, maximal duration and notes of I/O-slices
+    and the number of slices that took longer than the slack """
+
+    n = max_time = max_notes = overruns = 0
+    for _,duration,notes,slack in self.records_io():
+      n        += 1
+      max_time  = max(max_time,duration)
+      max_notes = max(max_notes,notes)
+      if 0 <= slack < duration:
+        overruns += 1
+    return {'slices': n, 'max': max_time, 'notes': max_notes,
+            'overruns': overruns}
@@ -0,0 +1,83 @@
+# ----------------------------------------------------------------------------
+# Benchmark the text parser of MusicReader against the old line-based parser.
+#
+# Reports notes/sec and bytes allocated per note. On the device, allocations
+# are measured exactly with gc.mem_alloc() (gc disabled during the run). On
+# a host with CPython, tracemalloc only reports the peak, not the total, so
+# bytes/note is the peak divided by the number of notes.
+#
+# On the host, run with PYTHONPATH pointing to the repository. The file
+# FILENAME is created if it does not exist (needs a writable filesystem).
+#
+# Author: Bernhard Bablok
+# License: GPL3
+#
+# Website: https://github.com/bablokb/cp-buzzer-music
+#
+# ----------------------------------------------------------------------------
+
+import gc
+import time
+from buzzer_music.reader import MusicReader
+
+FILENAME = "bench.txt"
+NOTES    = 2000
+
+# old line-based parser (for comparison)
+def read_lines(filename,bpm=None,ref=None):
+  btime = None
+  with open(filename,"rt") as file:
+    for note in file:
+      if not note or note[0] == "#":
+        continue
+      elif "bpm" in note:
+        if not bpm:
+          bpm = int(note.split("=")[1])
+        continue
+      elif "ref" in note:
+        if not ref:
+          ref = float(note.split("=")[1])
+        continue
+      t, pitch, duration, *_ = note.split(" ")
+      if not btime:
+        btime = 60*(ref if ref else 0.25)/(bpm if bpm else 60)
+      yield float(t)*btime, pitch, float(duration)*btime
+
+# create test-file
+def create_file():
+  try:
+    open(FILENAME,"r").close()
+    return
+  except OSError:
+    pass
+  pitches = ["C4","E4","G4","C5","A#3","F#5"]
+  with open(FILENAME,"w") as file:
+    file.write("# benchmark\nbpm = 120\nref = 0.25\n")
+    for i in range(NOTES):
+      file.write(f"{i*1.0166663646698} {pitches[i%len(pitches)]} "
+                 f"{0.8213333487510681} 43\n")
+
+# run a single benchmark
+def bench(name,load):
+  start = time.monotonic_ns()
+  count = sum(1 for _ in load())
+  elapsed = time.monotonic_ns() - start
+  if hasattr(gc,"mem_alloc"):
+    gc.collect()
+    gc.disable()
+    mem = gc.mem_alloc()
+    sum(1 for _ in load())
+    mem = f"{(gc.mem_alloc()-mem)/count:.1f} bytes/note"
+    gc.enable()
+  else:
+    import tracemalloc
+    tracemalloc.start()
+    sum(1 for _ in load())
+    peak = tracemalloc.get_traced_memory()[1]
+    mem = f"{peak/count:.1f} bytes/note (peak {peak} bytes)"
+    tracemalloc.stop()
+  print(f"{name:8s}: {count} notes, {count*1e9/elapsed:9.0f} notes/s, {mem}")
+
+create_file()
+bench("lines",lambda: read_lines(FILENAME))
+bench("chunked",lambda: MusicReader().load(filename=FILENAME))
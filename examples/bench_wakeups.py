@@ -0,0 +1,121 @@
+# ----------------------------------------------------------------------------
+# Measure how much CPU the MusicPlayer leaves to other tasks.
+#
+# A background task counts its iterations while a player plays a song
+# (and pauses for a while). The script prints the iterations of the player
+# tasks and of the background task per second of music, for MusicPlayer
+# and for a model of the old busy-waiting dispatcher (it polled with
+# sleep(0) until the next note was due, also while paused). A busy-waiting
+# player needs thousands of iterations per second and halves the iterations
+# of the background task.
+#
+# On the host (CPython), the script uses the simulated pwmio and the clock
+# of tools/simulator.py (running at real time). Run it with PYTHONPATH
+# pointing to the repository.
+#
+# Author: Bernhard Bablok
+# License: GPL3
+#
+# Website: https://github.com/bablokb/cp-buzzer-music
+#
+# ----------------------------------------------------------------------------
+
+import sys
+import time
+import asyncio
+
+if sys.implementation.name == "cpython":
+  import os
+  sys.path.insert(0,os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),"..","tools"))
+  import simulator
+  simulator.install()
+  PINS = [0,1,2,3]
+else:
+  import board
+  PINS      = [board.GP18,board.GP17,board.GP15,board.GP13]
+  simulator = None
+
+from buzzer_music.player import MusicPlayer
+from buzzer_music.reader import MusicReader
+
+SONG = """
+0 C4 4 43;4 E4 4 43;8 G4 4 43;12 C5 4 43;16 G4 4 43;20 E4 4 43;
+24 C4 8 43;24 E4 8 43;24 G4 8 43;32 C5 8 43;
+"""
+BPM   = 120
+PAUSE = 2
+
+counter = 0
+
+# old dispatcher (for comparison): poll until the next note is due
+class BusyWaitPlayer:
+  def __init__(self):
+    self.wakeups = 0
+    self._pause  = False
+
+  def pause(self):
+    self._pause  = True
+    self._pstart = time.monotonic()
+
+  def resume(self):
+    self._pause  = False
+    self._start += time.monotonic() - self._pstart
+
+  def deinit(self):
+    pass
+
+  async def play(self,song,bpm):
+    self._start = time.monotonic()
+    last = 0
+    for note in MusicReader().load(song=song,bpm=bpm):
+      while self._pause or time.monotonic() - self._start < note[0]:
+        self.wakeups += 1
+        await asyncio.sleep(0)
+      last = max(last,note[0]+note[2])
+    while self._pause or time.monotonic() - self._start < last:
+      self.wakeups += 1
+      await asyncio.sleep(0)
+
+async def background():
+  global counter
+  while True:
+    counter += 1
+    await asyncio.sleep(0)
+
+async def pause(player):
+  await asyncio.sleep(1)
+  player.pause()
+  await asyncio.sleep(PAUSE)
+  player.resume()
+
+async def bench(name,player):
+  global counter
+  counter = 0
+  task = asyncio.create_task(background())
+
+  # idle reference
+  await asyncio.sleep(1)
+  idle = counter
+  counter = 0
+
+  start = time.monotonic()
+  await asyncio.gather(player.play(song=SONG,bpm=BPM),pause(player))
+  elapsed = time.monotonic() - start
+  task.cancel()
+  player.deinit()
+
+  print(f"{name}:")
+  print(f"  duration:       {elapsed:.2f}s (including {PAUSE}s pause)")
+  print(f"  player tasks:   {player.wakeups/elapsed:9.1f} iterations/s")
+  print(f"  background:     {counter/elapsed:9.1f} iterations/s")
+  print(f"  background/idle:{counter/elapsed/idle:9.2f}")
+
+async def main():
+  await bench("busy-waiting (old)",BusyWaitPlayer())
+  await bench("MusicPlayer",MusicPlayer(pins=PINS))
+
+if simulator:
+  simulator.run(main())
+else:
+  asyncio.run(main())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# ----------------------------------------------------------------------------
+# Analyze the polyphony of a song and pre-assign voices (buzzers).
+#
+# The notes of a song form an interval graph (notes are connected if they
+# overlap). Coloring this graph greedily in order of start assigns every
+# note a voice, so that notes of a voice never overlap. For interval graphs
+# the greedy coloring is optimal: the number of voices equals the peak
+# polyphony, i.e. the minimum number of buzzers needed.
+#
+# The script reports peak polyphony, minimum number of buzzers and the
+# conflicts (timespans with more notes than buzzers) and optionally writes
+# the song with a voice column. MusicPlayer routes notes with a voice
+# directly to the buzzer without searching for a free buzzer.
+#
+# Input is a text file (raw or preprocessed, see compile_music.py) or a
+# compiled song (*.bzm). Output is a compiled song if the name of the
+# output file ends in .bzm, otherwise a text file with the voice as fifth
+# field ("start pitch duration instrument voice").
+#
+# This script runs on the host (CPython), not on the device.
+#
+# Author: Bernhard Bablok
+# License: GPL3
+#
+# Website: https://github.com/bablokb/cp-buzzer-music
+#
+# ----------------------------------------------------------------------------
+
+import argparse
+import heapq
+import os
+import sys
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+from buzzer_music import songfile
+from buzzer_music.pitch import NAMES
+from compile_music import parse
+
+# --- load song   ------------------------------------------------------------
+
+def load(filename):
+  """ load song, return (notes,bpm,ref) with times in steps """
+
+  if filename.endswith(".bzm"):
+    with open(filename,"rb") as file:
+      return songfile.read(file)
+  with open(filename,"rt") as file:
+    return parse(file.read())
+
+# --- assign voices   --------------------------------------------------------
+
+def assign(notes):
+  """ assign voices to notes (greedy interval-graph coloring).
+
+  Returns a list of voices (one per note). The lowest free voice is
+  reused first.
+  """
+
+  order  = sorted(range(len(notes)),key=lambda i: notes[i][0])
+  voices = [0]*len(notes)
+  busy   = []                           # heap of (end,voice)
+  free   = []                           # heap of free voices
+  count  = 0
+  for i in order:
+    start, _, duration = notes[i][:3]
+    while busy and busy[0][0] <= start:
+      heapq.heappush(free,heapq.heappop(busy)[1])
+    if free:
+      voice = heapq.heappop(free)
+    else:
+      voice  = count
+      count += 1
+    voices[i] = voice
+    heapq.heappush(busy,(start+duration,voice))
+  return voices
+
+# --- find conflicts   -------------------------------------------------------
+
+def polyphony(notes,buzzers):
+  """ return (peak,time of peak,conflicts).
+
+  Conflicts are (start,end,polyphony) of timespans with more than
+  buzzers notes playing.
+  """
+
+  # ends sort before starts at the same time (notes don't overlap)
+  events = sorted([(note[0],1) for note in notes] +
+                  [(note[0]+note[2],-1) for note in notes])
+  active = peak = 0
+  tpeak  = 0
+  conflicts = []
+  current   = None
+  for t,delta in events:
+    active += delta
+    if active > peak:
+      peak, tpeak = active, t
+    if active > buzzers:
+      if current:
+        current[2] = max(current[2],active)
+      else:
+        current = [t,t,active]
+    elif current:
+      current[1] = t
+      conflicts.append(tuple(current))
+      current = None
+  return peak, tpeak, conflicts
+
+# --- write song with voices   -----------------------------------------------
+
+def write(filename,notes,voices,bpm,ref):
+  """ write notes with voices (compiled if filename ends in .bzm) """
+
+  notes = [note[:3]+(voice,) for note,voice in zip(notes,voices)]
+  notes.sort(key=lambda note: note[0])
+  if filename.endswith(".bzm"):
+    with open(filename,"wb") as file:
+      songfile.write(file,notes,bpm,ref)
+    return
+  with open(filename,"wt") as file:
+    if bpm:
+      file.write(f"bpm = {bpm}\n")
+    if ref:
+      file.write(f"ref = {ref}\n")
+    for t,pitch,duration,voice in notes:
+      file.write(f"{t} {NAMES[pitch]} {duration} 0 {voice}\n")
+
+# --- main   -----------------------------------------------------------------
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(
+    description="analyze polyphony and pre-assign voices")
+  parser.add_argument("-b","--buzzers",type=int,default=4,
+                      help="number of buzzers (default: 4)")
+  parser.add_argument("-w","--write",metavar="OUTFILE",
+                      help="write song with voices (*.bzm: compiled)")
+  parser.add_argument("infile",help="song (text or compiled)")
+  args = parser.parse_args()
+
+  notes, bpm, ref = load(args.infile)
+  step = 60*(ref if ref else 0.25)/(bpm if bpm else 60)   # seconds per step
+  voices = assign(notes)
+  peak, tpeak, conflicts = polyphony(notes,args.buzzers)
+
+  print(f"notes:           {len(notes)}")
+  print(f"peak polyphony:  {peak} (at {tpeak*step:.3f}s)")
+  print(f"minimum buzzers: {max(voices)+1 if voices else 0}")
+  print(f"conflicts with {args.buzzers} buzzers: {len(conflicts)}")
+  for start,end,active in conflicts:
+    print(f"  {start*step:9.3f}s - {end*step:9.3f}s: {active} notes")
+
+  if args.write:
+    if voices and max(voices) >= songfile.NO_VOICE:
+      sys.exit(f"error: too many voices ({max(voices)+1})")
+    write(args.write,notes,voices,bpm,ref)
+    print(f"created {args.write} with {len(notes)} notes")
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# ----------------------------------------------------------------------------
+# Benchmark MusicPlayer on the host with a simulated pwmio and virtual time.
+#
+# Plays generated songs of increasing density and polyphony and reports:
+#   notes/s  notes processed per second of real time (host throughput)
+#   late     dispatch lateness (p50/p99/max in ms, virtual time)
+#   drops    notes dropped (skip=True)
+#   queue    peak queue depth
+#   skew     longest time needed to switch on the notes of a chord (us)
+#   alloc    peak traced memory in KiB (with --alloc only, slow)
+#   gc       garbage collections (forced collections in parenthesis)
+#   gc-ms    duration of the longest collection (ms)
+#   ovl      notes scheduled during a collection
+#   io-ms    longest I/O-slice of the reader (ms)
+#
+# Use --save to store the results and --compare to check for regressions.
+#
+# This script runs on the host (CPython), not on the device.
+#
+# Author: Bernhard Bablok
+# License: GPL3
+#
+# Website: https://github.com/bablokb/cp-buzzer-music
+#
+# ----------------------------------------------------------------------------
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+import simulator
+simulator.install()
+from buzzer_music.player import MusicPlayer
+
+# (name, notes per minute, polyphony)
+SONGS = [
+  ("sparse",   120, 1),
+  ("medium",   300, 2),
+  ("dense",    600, 4),
+  ("crowded", 1200, 6),
+  ]
+
+# --- run a single benchmark   -----------------------------------------------
+
+def bench(density,polyphony,args):
+  """ play a generated song, return dict with metrics """
+
+  song   = simulator.generate(density,polyphony,args.length)
+  player = MusicPlayer(pins=list(range(args.buzzers)),skip=True,
+                       trace=song.count(";"))
+  if args.alloc:
+    tracemalloc.start()
+  start = time.perf_counter()
+  simulator.run(player.play(song=song,bpm=60,ref=1),args.slowdown)
+  elapsed = time.perf_counter() - start
+  alloc = 0
+  if args.alloc:
+    alloc = tracemalloc.get_traced_memory()[1]/1024
+    tracemalloc.stop()
+
+  summary = player.trace.summary()
+  collect = summary['gc']
+  drops   = sum(stat['drops'] for stat in player.stats.values())
+  return {
+    'notes':   summary['notes'],
+    'notes/s': summary['notes']/elapsed,
+    'p50':     summary['p50'],
+    'p99':     summary['p99'],
+    'max':     summary['max'],
+    'drops':   drops,
+    'queue':   max(player.trace.depth[:min(player.trace.count,
+                                           player.trace.size)]),
+    'skew':    summary['skew']['max'],
+    'alloc':   alloc,
+    'gc':      collect['collections'],
+    'forced':  collect['forced'],
+    'gc-ms':   collect['max'],
+    'ovl':     collect['overlaps'],
+    'io-ms':   summary['io']['max']
+    }
+
+# --- compare with saved results   -------------------------------------------
+
+def compare(results,filename,tolerance):
+  """ compare with saved results, return number of regressions """
+
+  with open(filename) as file:
+    saved = json.load(file)
+  regressions = 0
+  for name,metrics in results.items():
+    if not name in saved:
+      continue
+    old = saved[name]
+    for key,higher_is_better in (('notes/s',True),('p99',False),
+                                 ('drops',False),('ovl',False)):
+      a, b = old[key], metrics[key]
+      worse = b < a*(1-tolerance) if higher_is_better else (
+        b > a*(1+tolerance) and b-a > 1)
+      if worse:
+        print(f"regression: {name}/{key}: {a:.1f} -> {b:.1f}")
+        regressions += 1
+  return regressions
+
+# --- main   -----------------------------------------------------------------
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="benchmark MusicPlayer")
+  parser.add_argument("-b","--buzzers",type=int,default=4,
+                      help="number of buzzers (default: 4)")
+  parser.add_argument("-l","--length",type=float,default=60,
+                      help="length of songs in seconds (default: 60)")
+  parser.add_argument("-s","--slowdown",type=float,default=1,
+                      help="simulated slowdown of the device (default: 1)")
+  parser.add_argument("-a","--alloc",action="store_true",
+                      help="trace memory allocations (slow)")
+  parser.add_argument("--save",help="save results to file (json)")
+  parser.add_argument("--compare",help="compare with saved results")
+  parser.add_argument("--tolerance",type=float,default=0.2,
+                      help="tolerance for --compare (default: 0.2)")
+  args = parser.parse_args()
+
+  results = {}
+  print(f"{'song':8s} {'notes':>6s} {'notes/s':>9s} {'p50':>7s} {'p99':>7s}"
+        f" {'max':>7s} {'drops':>6s} {'queue':>6s} {'skew':>6s} {'alloc':>7s}"
+        f" {'gc':>7s} {'gc-ms':>6s} {'ovl':>4s} {'io-ms':>6s}")
+  for name,density,polyphony in SONGS:
+    m = bench(density,polyphony,args)
+    results[name] = m
+    print(f"{name:8s} {m['notes']:6d} {m['notes/s']:9.0f} {m['p50']:7.2f}"
+          f" {m['p99']:7.2f} {m['max']:7.2f} {m['drops']:6d} {m['queue']:6d}"
+          f" {m['skew']:6d}"
+          f" {m['alloc']:7.1f} {m['gc']:3d} ({m['forced']:1d})"
+          f" {m['gc-ms']:6d} {m['ovl']:4d} {m['io-ms']:6d}")
+
+  if args.save:
+    with open(args.save,"w") as file:
+      json.dump(results,file,indent=2)
+  if args.compare:
+    sys.exit(1 if compare(results,args.compare,args.tolerance) else 0)
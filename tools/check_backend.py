@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# ----------------------------------------------------------------------------
+# Check MusicPlayer on the host with a stand-in backend.
+#
+# Plays a short song (a chord and a melody) with RecordingBackend on plain
+# CPython: no simulator, no pwmio, no gc.mem_alloc()/gc.mem_free() and the
+# real clock. The check passes if every note of the song was switched on
+# with its frequency and every output is switched off at the end, once
+# with one voice per buzzer and once with multiplexed buzzers.
+#
+# This script runs on the host (CPython), not on the device.
+#
+# Author: Bernhard Bablok
+# License: GPL3
+#
+# Website: https://github.com/bablokb/cp-buzzer-music
+#
+# ----------------------------------------------------------------------------
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+from buzzer_music.player import MusicPlayer
+from buzzer_music.backend import RecordingBackend
+from buzzer_music.pitch import PITCH
+
+SONG = "0 C4 4 0;0 E4 4 0;0 G4 4 0;4 A4 2 0;6 B4 2 0;8 C5 4 0;"
+BPM  = 600             # 25ms per step
+
+# --- play song and check log   ----------------------------------------------
+
+def check(pins,voices):
+  """ play song, return list of errors """
+
+  backend = RecordingBackend()
+  player  = MusicPlayer(pins=list(range(pins)),voices=voices,backend=backend)
+  asyncio.run(player.play(song=SONG,bpm=BPM))
+  player.deinit()
+
+  errors   = []
+  expected = {PITCH[note.split()[1]] for note in SONG.split(";") if note}
+  played   = {freq for _,_,freq,duty in backend.log if duty}
+  if played != expected:
+    errors.append(f"frequencies {sorted(played)}, expected {sorted(expected)}")
+  last = {}
+  for _,pin,_,duty in backend.log:
+    last[pin] = duty
+  if any(last.values()):
+    errors.append(f"outputs still on: {[p for p,d in last.items() if d]}")
+  return errors
+
+# --- main   -----------------------------------------------------------------
+
+if __name__ == "__main__":
+  failed = False
+  for pins,voices in ((4,1),(2,2)):
+    errors = check(pins,voices)
+    print(f"{pins} buzzers, {voices} voices: {'failed' if errors else 'ok'}")
+    for error in errors:
+      print(f"  error: {error}",file=sys.stderr)
+    failed = failed or bool(errors)
+  if "pwmio" in sys.modules or "simulator" in sys.modules:
+    print("error: check did not run without the simulator",file=sys.stderr)
+    failed = True
+  sys.exit(1 if failed else 0)
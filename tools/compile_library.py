@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# ----------------------------------------------------------------------------
+# Compile a whole music library and create its catalog.
+#
+# All songs (*.raw and *.txt, see compile_music.py) of the input directory
+# are validated and compiled in parallel (one process per CPU) to compiled
+# songs (*.bzm) or to sorted text files (--text). The catalog (catalog.txt,
+# see buzzer_music/catalog.py) of the output directory lists every song with
+# duration, number of notes, required buzzers and pitch range, so a device
+# can pick songs without opening them. If a song exists as raw notes and
+# as preprocessed text, the text is used.
+#
+# Builds are incremental: the catalog keeps a hash of every source, songs
+# with an unchanged source (and existing output) are not compiled again.
+# Errors (unknown pitches, malformed notes or headers, values out of range)
+# are reported per file, without leaving partial output. The catalog lists
+# the songs that compiled, the exit code is 1 if any song failed.
+#
+# This script runs on the host (CPython), not on the device.
+#
+# Author: Bernhard Bablok
+# License: GPL3
+#
+# Website: https://github.com/bablokb/cp-buzzer-music
+#
+# ----------------------------------------------------------------------------
+
+import argparse
+import hashlib
+import os
+import sys
+
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+from buzzer_music import catalog, songfile
+from buzzer_music.pitch import NAMES
+from compile_music import parse
+from analyze_music import polyphony
+
+SOURCES = (".raw",".txt")
+
+# --- hash of a source   -----------------------------------------------------
+
+def source_hash(data,args):
+  """ hash of source and of options changing the output """
+  options = f"{args.text}:{args.bpm}:{args.ref}".encode()
+  return hashlib.sha256(options+b"\0"+data).hexdigest()[:16]
+
+# --- write text   -----------------------------------------------------------
+
+def write_text(filename,notes,bpm,ref):
+  """ write sorted notes as text ("start pitch duration instrument[ voice]") """
+
+  with open(filename,"wt") as file:
+    if bpm:
+      file.write(f"bpm = {bpm}\n")
+    if ref:
+      file.write(f"ref = {ref}\n")
+    for t,pitch,duration,voice in notes:
+      file.write(f"{t} {NAMES[pitch]} {duration} 0")
+      file.write("\n" if voice is None else f" {voice}\n")
+
+# --- compile a single song   ------------------------------------------------
+
+def build(job):
+  """ compile a song, return (catalog-entry,None) or (None,error) """
+
+  infile, outfile, hash_, bpm, ref, text = job
+  written = False
+  try:
+    with open(infile,"rt") as file:
+      notes, fbpm, fref = parse(file.read())
+    if not notes:
+      raise ValueError("no notes")
+    bpm = bpm or fbpm
+    ref = ref or fref
+    written = True
+    if text:
+      write_text(outfile,notes,bpm,ref)
+    else:
+      with open(outfile,"wb") as file:
+        songfile.write(file,notes,bpm,ref)
+  except Exception as ex:              # report every error per file
+    if written and os.path.exists(outfile):
+      os.remove(outfile)               # don't leave partial output
+    return None, f"{infile}: {ex}"
+
+  step     = 60*(ref if ref else 0.25)/(bpm if bpm else 60)
+  end      = max(note[0]+note[2] for note in notes)
+  pitches  = [note[1] for note in notes]
+  peak     = polyphony(notes,0)[0]
+  return (os.path.basename(outfile),end*step,len(notes),peak,
+          NAMES[min(pitches)],NAMES[max(pitches)],hash_), None
+
+# --- compile library   ------------------------------------------------------
+
+def compile_library(args):
+  """ compile all changed songs, write catalog, return list of errors """
+
+  outdir  = args.outdir or args.indir
+  ext     = ".txt" if args.text else ".bzm"
+  catfile = os.path.join(outdir,catalog.CATALOG)
+  old = {}
+  if os.path.exists(catfile) and not args.force:
+    old = {entry[0]: entry for entry in catalog.read(catfile)}
+
+  # one source per song: preprocessed text wins over raw notes, unless
+  # the text is the output of a previous run
+  sources = {}
+  for name in sorted(os.listdir(args.indir)):
+    infile = os.path.join(args.indir,name)
+    if (not name.endswith(SOURCES) or name == catalog.CATALOG or
+        not os.path.isfile(infile)):
+      continue
+    outname = os.path.splitext(name)[0] + ext
+    if os.path.abspath(os.path.join(outdir,outname)) == os.path.abspath(infile):
+      continue
+    if outname not in sources or name.endswith(".txt"):
+      sources[outname] = infile
+
+  entries = []
+  jobs    = []
+  errors  = []
+  for outname,infile in sources.items():
+    outfile = os.path.join(outdir,outname)
+    if len(outname.split()) != 1:
+      errors.append(f"{infile}: file name contains whitespace")
+      continue
+    with open(infile,"rb") as file:
+      hash_ = source_hash(file.read(),args)
+    entry = old.get(outname,None)
+    if entry and entry[6] == hash_ and os.path.exists(outfile):
+      entries.append(entry)
+    else:
+      jobs.append((infile,outfile,hash_,args.bpm,args.ref,args.text))
+
+  unchanged = len(entries)
+  os.makedirs(outdir,exist_ok=True)
+  if jobs:
+    with ProcessPoolExecutor(args.jobs) as pool:
+      for entry,error in pool.map(build,jobs):
+        if error:
+          errors.append(error)
+        else:
+          entries.append(entry)
+
+  entries.sort(key=lambda entry: entry[0])
+  catalog.write(catfile,entries)
+  print(f"{len(entries)} songs in {catfile} "
+        f"({len(entries)-unchanged} compiled, {unchanged} unchanged, "
+        f"{len(errors)} failed)")
+  return errors
+
+# --- main   -----------------------------------------------------------------
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(
+    description="compile a music library and create its catalog")
+  parser.add_argument("-o","--outdir",
+                      help="output directory (default: input directory)")
+  parser.add_argument("-t","--text",action="store_true",
+                      help="write sorted text files instead of *.bzm")
+  parser.add_argument("-j","--jobs",type=int,
+                      help="number of processes (default: number of CPUs)")
+  parser.add_argument("-f","--force",action="store_true",
+                      help="compile all songs (ignore catalog)")
+  parser.add_argument("-b","--bpm",type=int,help="beats per minute")
+  parser.add_argument("-r","--ref",type=float,help="reference note for bpm")
+  parser.add_argument("indir",help="directory with songs (*.raw, *.txt)")
+  args = parser.parse_args()
+
+  errors = compile_library(args)
+  for error in errors:
+    print(f"error: {error}",file=sys.stderr)
+  sys.exit(1 if errors else 0)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# ----------------------------------------------------------------------------
+# Compile notes to the binary song format (*.bzm) read by MusicReader.
+#
+# Input is either a preprocessed text file (one note per line, optional
+# bpm=/ref= headers, see tools/preprocess-music.sh) or the raw notes copied
+# from onlinesequencer.net (notes separated by ';', including the header
+# 'Online Sequencer:123456:' and the trailing ':'). The notes are sorted
+# by start, so no preprocessing is necessary.
+#
+# This script runs on the host (CPython), not on the device.
+#
+# Author: Bernhard Bablok
+# License: GPL3
+#
+# Website: https://github.com/bablokb/cp-buzzer-music
+#
+# ----------------------------------------------------------------------------
+
+import argparse
+import os
+import re
+import sys
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+from buzzer_music import songfile
+from buzzer_music.pitch import NAMES
+
+PITCH_INDEX = {name: index for index,name in enumerate(NAMES)}
+
+# --- parse notes   ----------------------------------------------------------
+
+def parse(text):
+  """ parse text, return (notes,bpm,ref).
+
+  Notes are (start,index,duration,voice), voice is None unless the note
+  has a voice-column (fifth field, see tools/analyze_music.py).
+  """
+
+  bpm = 0
+  ref = 0
+  if ';' in text:
+    text = re.sub(r"^[^:]*:[^:]*:","",text.strip()).rstrip(":")
+    lines = text.replace("\n","").replace("\r","").split(";")
+  else:
+    lines = text.splitlines()
+
+  notes = []
+  for nr,line in enumerate(lines,1):
+    line = line.strip()
+    if not line or line[0] == "#":
+      continue
+    elif "=" in line:
+      key, value = [token.strip() for token in line.split("=",1)]
+      if key not in ("bpm","ref"):
+        raise ValueError(f"line {nr}: unknown header '{key}'")
+      try:
+        if key == "bpm":
+          bpm = float(value)            # e.g. "137.0" from MusicReader.sort()
+          if bpm != int(bpm) or not 0 <= bpm <= songfile.MAX_BPM:
+            raise ValueError
+          bpm = int(bpm)
+        else:
+          ref = float(value)
+      except ValueError:
+        raise ValueError(f"line {nr}: malformed header '{line}'")
+      continue
+    try:
+      t, pitch, duration, *rest = line.split()
+      note = (float(t),PITCH_INDEX[pitch],float(duration),
+              int(rest[1]) if len(rest) > 1 else None)
+    except KeyError:
+      raise ValueError(f"note {nr}: unknown pitch '{pitch}'")
+    except ValueError:
+      raise ValueError(f"note {nr}: malformed note '{line}'")
+    if note[0] < 0 or note[2] < 0:
+      raise ValueError(f"note {nr}: negative start or duration '{line}'")
+    if note[3] is not None and not 0 <= note[3] < songfile.NO_VOICE:
+      raise ValueError(f"note {nr}: voice out of range "
+                       f"(0-{songfile.NO_VOICE-1}) '{line}'")
+    notes.append(note)
+  notes.sort(key=lambda note: note[0])
+  return notes, bpm, ref
+
+# --- compile a single file   ------------------------------------------------
+
+def compile_file(infile,outfile=None,bpm=None,ref=None):
+  """ compile infile, return name of outfile and number of notes """
+
+  if not outfile:
+    outfile = os.path.splitext(infile)[0] + ".bzm"
+  with open(infile,"rt") as file:
+    notes, fbpm, fref = parse(file.read())
+  with open(outfile,"wb") as file:
+    songfile.write(file,notes,bpm or fbpm,ref or fref)
+  return outfile, len(notes)
+
+# --- main   -----------------------------------------------------------------
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="compile notes to .bzm")
+  parser.add_argument("-b","--bpm",type=int,help="beats per minute")
+  parser.add_argument("-r","--ref",type=float,help="reference note for bpm")
+  parser.add_argument("infile",help="raw notes or preprocessed text file")
+  parser.add_argument("outfile",nargs="?",help="output file (default: *.bzm)")
+  args = parser.parse_args()
+
+  outfile, count = compile_file(args.infile,args.outfile,args.bpm,args.ref)
+  print(f"created {outfile} with {count} notes")
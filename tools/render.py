@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# ----------------------------------------------------------------------------
+# Render songs to WAV files on the host (much faster than real time).
+#
+# The song is played by MusicPlayer with a simulated pwmio and a virtual
+# clock that only advances while the player sleeps (see simulator.py), so
+# the notes are read, allocated to buzzers (including voices, steal-policies
+# and multiplexing) and switched exactly as on the device. The recorded
+# changes of frequency and duty-cycle of every buzzer are then synthesized
+# as square waves (the duty-cycle reflects the volume, see VOLDIV in
+# async_buzzer.py) and mixed to a 16-bit mono WAV file.
+#
+# Synthesis needs numpy. This script runs on the host (CPython), not on the
+# device.
+#
+# Author: Bernhard Bablok
+# License: GPL3
+#
+# Website: https://github.com/bablokb/cp-buzzer-music
+#
+# ----------------------------------------------------------------------------
+
+import argparse
+import os
+import sys
+import time
+import wave
+
+try:
+  import numpy as np
+except ImportError:
+  sys.exit("error: the renderer needs numpy (pip install numpy)")
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+import simulator
+simulator.install()
+from buzzer_music.player import MusicPlayer
+from buzzer_music.async_buzzer import DC_ON
+
+RATE = 44100          # sample rate
+GAIN = 0.8            # level of a single buzzer at full volume
+
+# --- play song and record PWM   ---------------------------------------------
+
+def record(filename,args):
+  """ play song with virtual time, return PWM-log (time,pin,freq,duty) """
+
+  player = MusicPlayer(pins=list(range(args.buzzers)),volume=args.volume,
+                       voices=args.voices,policy=args.policy)
+  simulator.PWMOut.log = []
+  simulator.run(player.play(filename,bpm=args.bpm,ref=args.ref),slowdown=0)
+  return simulator.PWMOut.log
+
+# --- synthesize square waves   ----------------------------------------------
+
+def synthesize(log,buzzers,rate=RATE):
+  """ mix square waves of all buzzers, return float32 samples (-1.0,1.0) """
+
+  if not log:
+    return np.zeros(0,dtype=np.float32)
+  t0 = log[0][0]
+  samples = np.zeros(int((log[-1][0]-t0)*rate)+1,dtype=np.float32)
+  state   = {}                          # pin -> (start-sample,freq,duty)
+
+  for t,pin,freq,duty in log + [(log[-1][0],None,0,0)]:
+    pos = int((t-t0)*rate)
+    pins = state.keys() if pin is None else [pin]
+    for p in list(pins):
+      start, f, d = state.pop(p,(pos,0,0))
+      if d and f and pos > start:
+        # phase from absolute sample position: continuous across changes
+        phase = (np.arange(start,pos)*(f/rate)) % 1.0
+        samples[start:pos] += (phase < d) - d
+    if pin is not None:
+      state[pin] = (pos,freq,duty/DC_ON)
+
+  return samples*(GAIN/buzzers)
+
+# --- write WAV   ------------------------------------------------------------
+
+def write_wav(filename,samples,rate=RATE):
+  """ write samples (-1.0,1.0) as 16-bit mono WAV """
+
+  pcm = (np.clip(samples,-1.0,1.0)*32767).astype("<i2")
+  with wave.open(filename,"wb") as file:
+    file.setnchannels(1)
+    file.setsampwidth(2)
+    file.setframerate(rate)
+    file.writeframes(pcm.tobytes())
+
+# --- main   -----------------------------------------------------------------
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="render songs to WAV")
+  parser.add_argument("-B","--buzzers",type=int,default=4,
+                      help="number of buzzers (default: 4)")
+  parser.add_argument("-v","--volume",type=int,default=10,
+                      help="volume 1-10 (default: 10)")
+  parser.add_argument("-V","--voices",type=int,default=1,
+                      help="voices per buzzer (multiplexing, default: 1)")
+  parser.add_argument("-p","--policy",help="steal policy (default: none)")
+  parser.add_argument("-b","--bpm",type=int,help="beats per minute")
+  parser.add_argument("-r","--ref",type=float,help="reference note for bpm")
+  parser.add_argument("-R","--rate",type=int,default=RATE,
+                      help=f"sample rate (default: {RATE})")
+  parser.add_argument("-o","--outdir",
+                      help="output directory (default: next to the song)")
+  parser.add_argument("songs",nargs="+",help="songs (text, *.bzm, *.mid)")
+  args = parser.parse_args()
+
+  for filename in args.songs:
+    start   = time.perf_counter()
+    log     = record(filename,args)
+    samples = synthesize(log,args.buzzers,args.rate)
+    outfile = os.path.splitext(filename)[0] + ".wav"
+    if args.outdir:
+      outfile = os.path.join(args.outdir,os.path.basename(outfile))
+    write_wav(outfile,samples,args.rate)
+    elapsed  = time.perf_counter() - start
+    duration = len(samples)/args.rate
+    print(f"{outfile}: {duration:.1f}s in {elapsed:.2f}s "
+          f"({duration/max(elapsed,1e-6):.0f}x real time)")
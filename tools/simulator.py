@@ -0,0 +1,206 @@
+# ----------------------------------------------------------------------------
+# Simulation of the device for running the library on a host (CPython).
+#
+# This module provides:
+#   - a fake pwmio-module recording all changes of frequency and duty-cycle
+#   - a fake synthio-module (for backend.SynthBackend) recording all
+#     presses and releases of notes
+#   - gc.mem_alloc()/gc.mem_free() of CircuitPython (based on tracemalloc,
+#     so they only report allocations while tracemalloc is tracing)
+#   - a virtual clock (time.monotonic is replaced) and an event-loop that
+#     advances the virtual clock instead of sleeping
+#   - a generator for songs of a given density
+#
+# The virtual clock runs 'slowdown' times faster than the real clock while
+# the program is busy, so slowdown > 1 simulates a slower device.
+#
+# This module runs on the host (CPython), not on the device.
+#
+# Author: Bernhard Bablok
+# License: GPL3
+#
+# Website: https://github.com/bablokb/cp-buzzer-music
+#
+# ----------------------------------------------------------------------------
+
+import asyncio
+import gc
+import random
+import selectors
+import sys
+import time
+import tracemalloc
+import types
+
+from contextlib import contextmanager
+
+# --- fake PWM   -------------------------------------------------------------
+
+class PWMOut:
+  """ fake pwmio.PWMOut recording all changes to PWMOut.log """
+
+  log = []          # (time,pin,frequency,duty_cycle)
+
+  def __init__(self,pin,duty_cycle=0,frequency=500,variable_frequency=False):
+    self._pin = pin
+    self._frequency  = frequency
+    self._duty_cycle = duty_cycle
+
+  def deinit(self):
+    pass
+
+  @property
+  def frequency(self):
+    return self._frequency
+
+  @frequency.setter
+  def frequency(self,value):
+    self._frequency = value
+    PWMOut.log.append((time.monotonic(),self._pin,value,self._duty_cycle))
+
+  @property
+  def duty_cycle(self):
+    return self._duty_cycle
+
+  @duty_cycle.setter
+  def duty_cycle(self,value):
+    self._duty_cycle = value
+    PWMOut.log.append((time.monotonic(),self._pin,self._frequency,value))
+
+# --- fake synthio   ---------------------------------------------------------
+
+class Note:
+  """ fake synthio.Note """
+
+  def __init__(self,frequency,amplitude=1.0,waveform=None):
+    self.frequency = frequency
+    self.amplitude = amplitude
+    self.waveform  = waveform
+
+class Synthesizer:
+  """ fake synthio.Synthesizer recording to Synthesizer.log """
+
+  log = []          # (time,'press'|'release',frequency,amplitude)
+
+  def __init__(self,sample_rate=11025,channel_count=1,waveform=None):
+    self.sample_rate = sample_rate
+    self.pressed     = []
+
+  def press(self,note):
+    self.pressed.append(note)
+    Synthesizer.log.append(
+      (time.monotonic(),'press',note.frequency,note.amplitude))
+
+  def release(self,note):
+    self.pressed.remove(note)
+    Synthesizer.log.append(
+      (time.monotonic(),'release',note.frequency,note.amplitude))
+
+HEAP_SIZE = 1024*1024      # simulated heap (objects on CPython are larger)
+
+def _mem_alloc():
+  return tracemalloc.get_traced_memory()[0]
+
+def _mem_free():
+  return max(0,HEAP_SIZE-_mem_alloc())
+
+def install():
+  """ install fake pwmio/synthio-modules and gc-functions (call before
+  importing buzzer_music) """
+  module = types.ModuleType("pwmio")
+  module.PWMOut = PWMOut
+  sys.modules["pwmio"] = module
+  module = types.ModuleType("synthio")
+  module.Note        = Note
+  module.Synthesizer = Synthesizer
+  sys.modules["synthio"] = module
+  if not hasattr(gc,"mem_alloc"):
+    gc.mem_alloc = _mem_alloc
+    gc.mem_free  = _mem_free
+
+# --- virtual clock   --------------------------------------------------------
+
+class VirtualClock:
+  """ clock advancing while idle (and 'slowdown' times real time if busy) """
+
+  def __init__(self,slowdown=1.0,start=0.0):
+    self.slowdown = slowdown
+    self.offset   = start
+    self._real    = time.perf_counter
+    self._start   = self._real()
+
+  def monotonic(self):
+    return self.offset + (self._real()-self._start)*self.slowdown
+
+  def monotonic_ns(self):
+    return int(self.monotonic()*1e9)
+
+  def advance(self,seconds):
+    self.offset += seconds
+
+class _VirtualSelector(selectors.DefaultSelector):
+  """ selector advancing the virtual clock instead of waiting """
+
+  def __init__(self,clock):
+    super().__init__()
+    self._clock = clock
+
+  def select(self,timeout=None):
+    if timeout:
+      self._clock.advance(timeout)
+    return super().select(0)
+
+@contextmanager
+def virtual_time(slowdown=1.0,start=0.0):
+  """ replace time.monotonic with a virtual clock, yield the clock.
+
+  start: initial value of the clock (uptime in seconds)
+  """
+
+  clock = VirtualClock(slowdown,start)
+  saved = time.monotonic, time.monotonic_ns
+  time.monotonic, time.monotonic_ns = clock.monotonic, clock.monotonic_ns
+  ticks = sys.modules.get("adafruit_ticks")   # binds monotonic_ns on import
+  if ticks and hasattr(ticks,"_monotonic_ns"):
+    saved_ticks = ticks._monotonic_ns
+    ticks._monotonic_ns = clock.monotonic_ns
+  try:
+    yield clock
+  finally:
+    time.monotonic, time.monotonic_ns = saved
+    if ticks and hasattr(ticks,"_monotonic_ns"):
+      ticks._monotonic_ns = saved_ticks
+
+def run(coro,slowdown=1.0,start=0.0):
+  """ run coroutine with virtual time, return (result,virtual duration) """
+
+  with virtual_time(slowdown,start) as clock:
+    loop = asyncio.SelectorEventLoop(_VirtualSelector(clock))
+    try:
+      begin  = clock.monotonic()
+      result = loop.run_until_complete(coro)
+      return result, clock.monotonic() - begin
+    finally:
+      loop.close()
+
+# --- song generator   -------------------------------------------------------
+
+def generate(density=240,polyphony=1,length=60,seed=42):
+  """ create a song (string) for bpm=60/ref=1, i.e. times in seconds.
+
+  density: notes per minute
+  polyphony: notes per onset (chord size)
+  length: length in seconds
+  """
+
+  rnd    = random.Random(seed)
+  names  = ['C','C#','D','D#','E','F','F#','G','G#','A','A#','B']
+  step   = 60*polyphony/density
+  notes  = []
+  t      = 0.0
+  while t < length:
+    for _ in range(polyphony):
+      pitch = f"{rnd.choice(names)}{rnd.randint(3,6)}"
+      notes.append(f"{t:.4f} {pitch} {0.9*step:.4f} 0")
+    t += step
+  return ";".join(notes) + ";"
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# ----------------------------------------------------------------------------
+# Soak test of MusicPlayer: play a song repeatedly starting at a given
+# uptime, using a virtual clock (see simulator.py).
+#
+# The default uptime starts shortly before the wraparound of the ticks
+# (2**29 ms, about 6.2 days), so playback crosses the wraparound. The script
+# reports the lateness of every play and the resolution a 30-bit float
+# (as used by time.monotonic() on CircuitPython) would have at that uptime.
+#
+# This script runs on the host (CPython), not on the device.
+#
+# Author: Bernhard Bablok
+# License: GPL3
+#
+# Website: https://github.com/bablokb/cp-buzzer-music
+#
+# ----------------------------------------------------------------------------
+
+import argparse
+import asyncio
+import math
+import os
+import sys
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+import simulator
+simulator.install()
+from buzzer_music.player import MusicPlayer
+
+TICKS_PERIOD = 2**29/1000       # wraparound of ticks in seconds
+
+# --- play song repeatedly   -------------------------------------------------
+
+async def soak(player,song,plays):
+  """ play song repeatedly, return list of (lateness-summary,duration) """
+
+  results = []
+  for _ in range(plays):
+    start = asyncio.get_running_loop().time()
+    await player.play(song=song,bpm=60,ref=1)
+    results.append((player.trace.summary(),
+                    asyncio.get_running_loop().time()-start))
+  return results
+
+# --- main   -----------------------------------------------------------------
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="soak test of MusicPlayer")
+  parser.add_argument("-d","--days",type=float,
+                      default=(TICKS_PERIOD-600)/86400,
+                      help="uptime at start in days (default: shortly "
+                      "before the ticks wrap around)")
+  parser.add_argument("-H","--hours",type=float,default=1,
+                      help="hours of music to play (default: 1)")
+  parser.add_argument("-l","--length",type=float,default=60,
+                      help="length of the song in seconds (default: 60)")
+  parser.add_argument("-n","--density",type=int,default=240,
+                      help="notes per minute (default: 240)")
+  args = parser.parse_args()
+
+  song   = simulator.generate(args.density,1,args.length)
+  plays  = max(1,int(args.hours*3600/args.length))
+  player = MusicPlayer(pins=[1,2],trace=song.count(";"))
+  uptime = args.days*86400
+  results, duration = simulator.run(soak(player,song,plays),start=uptime)
+
+  late = [summary['max'] for summary,_ in results]
+  durations = [d for _,d in results]
+  end = uptime + duration
+  print(f"uptime:     {uptime/86400:.3f} - {end/86400:.3f} days"
+        f" ({int(end/TICKS_PERIOD)-int(uptime/TICKS_PERIOD)} ticks wraparounds)")
+  print(f"plays:      {plays} x {args.length}s")
+  print(f"lateness:   max {max(late)}ms, mean of max "
+        f"{sum(late)/len(late):.2f}ms")
+  print(f"duration:   min {min(durations):.3f}s, max {max(durations):.3f}s")
+  resolution = 2**(math.floor(math.log2(end))-21)
+  print(f"30-bit float resolution at end: {1000*resolution:.1f}ms")